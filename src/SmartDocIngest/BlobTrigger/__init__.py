@@ -8,11 +8,15 @@ import uuid
 from Configuration.Settings import Settings
 from urllib.parse import urlparse
 from Processors.IngestionProcessor import IngestionProcessor
+from Utility.log_pipeline import STRUCTURED_LOG, LogPipeline, parse_sample_rates
 
 class BlobTriggerIngestion:
     
     def __init__(self):    
         self._settings = Settings()    
+        STRUCTURED_LOG.configure(self._settings.log_max_field_chars, parse_sample_rates(self._settings.log_sample_rates))
+        if self._settings.log_pipeline_enabled:
+            LogPipeline.start()
 
     async def process_query(self,myblob: func.InputStream):    
     
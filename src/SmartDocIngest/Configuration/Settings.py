@@ -23,6 +23,9 @@ class Settings(BaseModel):
     user_history_retrieval_limit : Optional[int]=10
     blob_sas_url_expiry_window : Optional[int]= 60
     is_parse_by_docintelligence:Optional[bool]=False
+    log_pipeline_enabled: Optional[bool] = False
+    log_max_field_chars: Optional[int] = 1000
+    log_sample_rates: Optional[str] = ""
     
     def __init__(self):
         super().__init__()
@@ -72,6 +75,10 @@ class Settings(BaseModel):
             self.openai_api_base = self.fetch_secret_value(secret_client,"OPENAI_API_BASE")
             self.openai_api_version = self.fetch_secret_value(secret_client,"OPENAI_API_VERSION")
             self.is_parse_by_docintelligence = self.fetch_secret_value(secret_client,"IS_PARSE_BY_DOCINTELLIGENCE")
+            # Logging settings are plain app settings, not Key Vault secrets.
+            self.log_pipeline_enabled = os.environ.get("LOG_PIPELINE_ENABLED", "False").lower() == "true"
+            self.log_max_field_chars = int(os.environ.get("LOG_MAX_FIELD_CHARS", self.log_max_field_chars))
+            self.log_sample_rates = os.environ.get("LOG_SAMPLE_RATES", self.log_sample_rates)
             
             if self.use_cache:
                 self.redis_host = self.fetch_secret_value(secret_client,"REDIS_HOST")
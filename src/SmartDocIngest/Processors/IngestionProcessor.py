@@ -3,6 +3,7 @@ import logging
 import json
 from Models.Document import Document
 from Utility import functions
+from Utility.log_pipeline import log_event
 from azure.search.documents import SearchClient
 from Configuration.Settings import Settings
 from Processors.IndexProcessor import IndexProcessor
@@ -172,8 +173,8 @@ class IngestionProcessor:
             if parser:
                 for page_number, page_content, is_image_present in parser.extract_text():
                     if len(page_content)>0 and page_content is not None:
-                        logging.info(f"Parsing page - {page_number} for document {documentIdentifier}")
-                        logging.info(f"page_content in content ingestion - {page_content} ")
+                        log_event("page", "Parsing page", page_number=page_number, document=documentIdentifier,
+                                  content_chars=len(page_content), content=page_content)
                         
                         if(page_content is None or len(page_content) == 0):
                             raise PDFParsingException("Unable to parse the document")
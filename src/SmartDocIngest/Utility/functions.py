@@ -4,12 +4,12 @@ import logging
 import timeit
 import hashlib
 import inspect
-import tiktoken
 import requests
 import re
 import aiohttp
 
 from azure.identity import ClientSecretCredential
+from Utility import tokenizer
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
@@ -52,80 +52,15 @@ def generate_cache_key(user_id, user_query, is_permission_check_enabled):
 
 def split_text_by_token(text: str, max_tokens: int, chunk_overlap: int) -> list:  
     """Split a text into chunks of a maximum number of tokens with a specified overlap."""
-    if max_tokens <= 0:  
-        raise ValueError("max_tokens must be greater than 0")  
-    if chunk_overlap < 0:  
-        raise ValueError("chunk_overlap must be non-negative")  
-    if chunk_overlap >= max_tokens:  
-        raise ValueError("chunk_overlap must be less than max_tokens")  
-
-    tokenizer = tiktoken.encoding_for_model("gpt-4-0314")  
-    tokens = tokenizer.encode(text)  
-
-    if not tokens:  
-        return []  
-
-    chunks = []  
-    start = 0  
-    while start < len(tokens):  
-        end = start + max_tokens  
-        chunk = tokens[start:end]  
-        chunks.append(chunk)  
-        start += max_tokens - chunk_overlap  
-
-    text_chunks = [tokenizer.decode(chunk) for chunk in chunks]  
-    return text_chunks 
+    return tokenizer.split_text_by_token(text, max_tokens, chunk_overlap)
 
 def count_tokens_str(messages, model="gpt-3.5-turbo-0613")->int:
-    """Return the number of tokens used by a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(messages))
-    except KeyError:
-        logging.info("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(messages))
-        
+    """Return the number of tokens used by a string."""
+    return tokenizer.count_text_tokens(messages, model)
+
 def count_tokens(messages, model="gpt-3.5-turbo-0613"):
     """Return the number of tokens used by a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        logging.info("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model in {
-        "gpt-3.5-turbo-0613",
-        "gpt-3.5-turbo-1106",
-        "gpt-3.5-turbo-16k-0613",
-        "gpt-4-0314",
-        "gpt-4-32k-0314",
-        "gpt-4-0613",
-        "gpt-4-32k-0613",
-        }:
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = 4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        tokens_per_name = -1  # if there's a name, the role is omitted
-    elif "gpt-3.5-turbo" in model:
-        
-        return count_tokens(messages, model="gpt-3.5-turbo-0613")
-    elif "gpt-4" in model:
-        
-        return count_tokens(messages, model="gpt-4-0613")
-    else:
-        raise NotImplementedError(
-            f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
-        )
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.items():
-            num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += tokens_per_name
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+    return tokenizer.count_message_tokens(messages, model)
 
 def get_arm_access_token(tenant_id, client_id, client_secret) -> str:
     credential = ClientSecretCredential(tenant_id, client_id, client_secret)
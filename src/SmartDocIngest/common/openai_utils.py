@@ -2,7 +2,6 @@ from datetime import datetime, timezone
 import os
 from typing import Optional
 import openai
-from tabulate import tabulate
 from pydantic import BaseModel, Field
 from askai_core.common import LLMModelConfiguration
 from askai_core.telemetry import OpenAiTelemetry
@@ -11,6 +10,7 @@ import logging
 from openai import APIConnectionError, AsyncAzureOpenAI, AzureOpenAI
 from askai_core.Utility.prompts import QUERY_SUGGESTION_PROMPT
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from Utility.log_pipeline import log_event
 
 
 class OpenAIUtility():
@@ -99,10 +99,7 @@ class OpenAIUtility():
         end_time =  datetime.now()
         duration = end_time - start_time
 
-        log_message = self.generate_log_message(response, duration)  
-            
-                
-        logging.info(f'\n{log_message}\n')
+        self.log_completion(response, duration)
         result = response.choices[0].message.content
         model = response.model
         if self.cosmos_endpoint and self.cosmos_endpoint != " ":
@@ -122,36 +119,19 @@ class OpenAIUtility():
         end_time =  datetime.now()
         duration = end_time - start_time
 
-        log_message = self.generate_log_message(response, duration)  
-            
-                
-        logging.info(f'\n{log_message}\n')
+        self.log_completion(response, duration)
         result = response.choices[0].message.content
         model = response.model
         if self.cosmos_endpoint and self.cosmos_endpoint != " ":
           await self.openai_telemetry.capture_telemetry_data(ai_assistant, conversation_id, prompt, result, start_time, end_time, model, response.usage.completion_tokens)
         return result
 
-    def generate_log_message(self, response, duration):
+    def log_completion(self, response, duration):
         try:
-            model = response.model
-            prompt_tokens = response.usage.prompt_tokens
-            completion_tokens = response.usage.completion_tokens
-            duration_sec = duration.total_seconds()
-            data = [  
-                    ["Model", model],  
-                    ["Prompt Tokens Used", prompt_tokens],  
-                    ["Completion Tokens Generated", completion_tokens],
-                    ["Duration (Sec)", duration_sec]
-                ]  
-                
-                # Generate the tabular message  
-            log_message = tabulate(data, tablefmt="grid")
-            return log_message
+            log_event("llm", "Chat completion", model=response.model, prompt_tokens=response.usage.prompt_tokens,
+                      completion_tokens=response.usage.completion_tokens, duration_sec=duration.total_seconds())
         except Exception as e:
-            logging.error(f'Error in generate_log_message: {e}')
-            return ""
-            
+            logging.error(f'Error in log_completion: {e}')
 
     @retry(wait=wait_exponential(multiplier=1, min=2, max=4), stop=stop_after_attempt(2))
     def generate_completion_sync(self, prompt, gpt_deployment_name= DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS):
@@ -165,8 +145,7 @@ class OpenAIUtility():
         )
         end_time =  datetime.now()
         duration = end_time - start_time
-        log_message = self.generate_log_message(response, duration)
-        logging.info(log_message)
+        self.log_completion(response, duration)
         result = response.choices[0].message.content
         return result
 
@@ -5,6 +5,7 @@ import logging
 from typing import Generator, Optional, Tuple
 import PyPDF2
 from PIL import Image
+from Utility.log_pipeline import log_event
 from askai_core.Utility.prompts import IMAGE_DESCRIPTION_PROMPT, TEXT_DATA_PROMPT
 
 from askai_core.content_parser.base_parser import BaseParser
@@ -22,17 +23,17 @@ class PDFParser(BaseParser):
                     page_content = None
                     if not IS_PARSE_BY_DOCINTELLIGENCE:
                         page_content = page.extract_text()
-                        logging.info(f"Extracted page content from pypdf: {page_content}")
+                        log_event("page", "Extracted page content from pypdf", page_number=page_number, content=page_content)
                     
                     if (page_content is None or page_content.strip() == "") and self.documentAnalysisClient is not None:
                         logging.info(f"documentAnalysisClient is not none")
                         
                         form_recognizer_content = self._extract_form_recognizer_content(page_number)
-                        logging.info(f"Extracted page content from form_recognizer_content: {form_recognizer_content}")
+                        log_event("page", "Extracted form recognizer content", page_number=page_number, content=form_recognizer_content)
                         
                         if form_recognizer_content:
                             page_content = " ".join(line.content for page in form_recognizer_content for line in page.lines if line.content)
-                            logging.info(f"Extracted page content from form_recognizer_content page_content: {page_content}")
+                            log_event("page", "Extracted page content from form recognizer", page_number=page_number, content=page_content)
                             
                     if self.openai_utility is not None and self.storage_manager is not None and self.process_image:
                         image_info = self.get_image_description(page, page_content, page_number)
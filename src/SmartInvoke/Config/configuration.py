@@ -39,6 +39,14 @@ class AppConfig(BaseAppConfig):
     def USE_CACHE(self) -> bool:  
         return self.load_bool_config_value('USE_CACHE', False)  
   
+    @property
+    def REDIS_HOST(self) -> str:
+        return self.load_config_value('REDIS_HOST', "")
+
+    @property
+    def REDIS_PASSWORD(self) -> Optional[str]:
+        return self.load_config_value('REDIS_PASSWORD', None)
+
     @property  
     def USE_HISTORY(self) -> bool:  
         return self.load_bool_config_value('USE_HISTORY', True)  
@@ -54,3 +62,115 @@ class AppConfig(BaseAppConfig):
     @property
     def PROCESS_COMMANDS(self) -> bool:
         return self.load_bool_config_value('PROCESS_COMMANDS', False)
+
+    @property
+    def COMBINED_COMMAND_PLANNING(self) -> bool:
+        return self.load_bool_config_value('COMBINED_COMMAND_PLANNING', False)
+
+    @property
+    def RESPONSE_REFINEMENT_TIMEOUT(self) -> float:
+        return float(self.load_config_value('RESPONSE_REFINEMENT_TIMEOUT', "30"))
+
+    @property
+    def QUERY_SUGGESTION_TIMEOUT(self) -> float:
+        return float(self.load_config_value('QUERY_SUGGESTION_TIMEOUT', "10"))
+
+    @property
+    def MAX_PARALLEL_TASKS(self) -> int:
+        return int(self.load_config_value('MAX_PARALLEL_TASKS', "4"))
+
+    @property
+    def AGENT_RETRIEVAL_ENABLED(self) -> bool:
+        return self.load_bool_config_value('AGENT_RETRIEVAL_ENABLED', False)
+
+    @property
+    def AGENT_RETRIEVAL_TOP_K(self) -> int:
+        return int(self.load_config_value('AGENT_RETRIEVAL_TOP_K', "8"))
+
+    @property
+    def HTTP_CONNECTION_LIMIT_PER_HOST(self) -> int:
+        return int(self.load_config_value('HTTP_CONNECTION_LIMIT_PER_HOST', "20"))
+
+    @property
+    def HTTP_CONNECT_TIMEOUT(self) -> float:
+        return float(self.load_config_value('HTTP_CONNECT_TIMEOUT', "5"))
+
+    @property
+    def HTTP_READ_TIMEOUT(self) -> float:
+        return float(self.load_config_value('HTTP_READ_TIMEOUT', "60"))
+
+    @property
+    def HTTP_KEEPALIVE_TIMEOUT(self) -> float:
+        return float(self.load_config_value('HTTP_KEEPALIVE_TIMEOUT', "60"))
+
+    @property
+    def HTTP_DNS_CACHE_TTL(self) -> int:
+        return int(self.load_config_value('HTTP_DNS_CACHE_TTL', "300"))
+
+    @property
+    def OPENAI_RPM_LIMIT(self) -> int:
+        return int(self.load_config_value('OPENAI_RPM_LIMIT', "0"))
+
+    @property
+    def OPENAI_TPM_LIMIT(self) -> int:
+        return int(self.load_config_value('OPENAI_TPM_LIMIT', "0"))
+
+    @property
+    def OPENAI_ENDPOINTS(self) -> str:
+        return self.load_config_value('OPENAI_ENDPOINTS', "")
+
+    @property
+    def COMPLETION_CACHE_ENABLED(self) -> bool:
+        return self.load_bool_config_value('COMPLETION_CACHE_ENABLED', False)
+
+    @property
+    def COMPLETION_CACHE_TTL(self) -> int:
+        return int(self.load_config_value('COMPLETION_CACHE_TTL', "3600"))
+
+    @property
+    def COMPLETION_CACHE_MAX_ENTRIES(self) -> int:
+        return int(self.load_config_value('COMPLETION_CACHE_MAX_ENTRIES', "1024"))
+
+    @property
+    def HEDGING_BUDGET_RATIO(self) -> float:
+        return float(self.load_config_value('HEDGING_BUDGET_RATIO', "0.1"))
+
+    @property
+    def TRACING_EXPORTER(self) -> str:
+        return self.load_config_value('TRACING_EXPORTER', "")
+
+    @property
+    def TRACING_FILE_PATH(self) -> str:
+        return self.load_config_value('TRACING_FILE_PATH', "traces.jsonl")
+
+    @property
+    def RESULT_COMPACTION_ENABLED(self) -> bool:
+        return self.load_bool_config_value('RESULT_COMPACTION_ENABLED', True)
+
+    @property
+    def DEPENDENCY_RESOLUTION_TOKEN_BUDGET(self) -> int:
+        return int(self.load_config_value('DEPENDENCY_RESOLUTION_TOKEN_BUDGET', "2000"))
+
+    @property
+    def MULTI_STEP_TOKEN_BUDGET(self) -> int:
+        return int(self.load_config_value('MULTI_STEP_TOKEN_BUDGET', "4000"))
+
+    @property
+    def LOG_PIPELINE_ENABLED(self) -> bool:
+        return self.load_bool_config_value('LOG_PIPELINE_ENABLED', False)
+
+    @property
+    def LOG_MAX_FIELD_CHARS(self) -> int:
+        return int(self.load_config_value('LOG_MAX_FIELD_CHARS', "1000"))
+
+    @property
+    def LOG_SAMPLE_RATES(self) -> str:
+        return self.load_config_value('LOG_SAMPLE_RATES', "")
+
+    @property
+    def STREAMING_PLANNER_ENABLED(self) -> bool:
+        return self.load_bool_config_value('STREAMING_PLANNER_ENABLED', False)
+
+    @property
+    def PLANNER_JSON_SCHEMA_ENABLED(self) -> bool:
+        return self.load_bool_config_value('PLANNER_JSON_SCHEMA_ENABLED', False)
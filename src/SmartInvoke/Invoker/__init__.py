@@ -1,3 +1,4 @@
 from .taskinvoker import SmartInvoker
+from .runtime import InvokerRuntime
 
-__all__ = ['SmartInvoker']
+__all__ = ['SmartInvoker', 'InvokerRuntime']
\ No newline at end of file
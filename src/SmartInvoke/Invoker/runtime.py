@@ -0,0 +1,174 @@
+import asyncio
+import atexit
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from Config import AppConfig
+from common import RequestData
+from common.agent_result_cache import AgentResultCache
+from common.agent_retriever import AgentRetriever
+from common.http_transport import HttpTransport
+from common.cache_utils import CacheFactory, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from common.plan_cache import PlanCache, DEFAULT_PLAN_TTL
+from common.openai_utils import OpenAIUtility
+from common.prompt_cache import FileFingerprint, get_file_fingerprint
+from .taskinvoker import SmartInvoker, SmartInvokerConfig
+
+
+class InvokerRuntime:
+    """Process-wide state shared by every SmartInvoker request.
+
+    Holds the parsed agent configuration, the instantiated agent registry, the
+    planner prompt with its precompiled agent catalog (the static planner prefix),
+    the OpenAI utility and the pooled HTTP transport used by the agents.
+    The files backing them are checked at most every ``REFRESH_INTERVAL_SECONDS``
+    and reloaded when their modification time changes; agents are only rebuilt
+    when the agent configuration itself changed.
+    """
+
+    REFRESH_INTERVAL_SECONDS = 5
+    _instance: Optional['InvokerRuntime'] = None
+    _instance_lock: Optional[asyncio.Lock] = None
+    _exit_hook_registered = False
+
+    def __init__(self, config_path: str, planner_prompt_path: str, command_prompt_path: str, openai_utility: OpenAIUtility):
+        self.config_path = config_path
+        self.planner_prompt_path = planner_prompt_path
+        self.command_prompt_path = command_prompt_path
+        self.openai_utility = openai_utility
+        self.http_transport = HttpTransport.from_app_config(AppConfig.get_instance())
+        self.config: Optional[SmartInvokerConfig] = None
+        self.agents: Dict[str, Any] = {}
+        self.planner_prompt: str = ""
+        self.agent_catalog: str = ""
+        self.planner_prefix: str = ""
+        self.result_cache: Optional[AgentResultCache] = None
+        self.plan_cache: Optional[PlanCache] = None
+        self.agent_retriever: Optional[AgentRetriever] = None
+        self._config_fingerprint: FileFingerprint = None
+        self._prompt_fingerprint: FileFingerprint = None
+        self._last_checked = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+    @classmethod
+    async def get_instance(cls, config_path: str, planner_prompt_path: str, command_prompt_path: str, openai_factory) -> 'InvokerRuntime':
+        """Return the shared runtime, building it on first use."""
+        if cls._instance_lock is None:
+            cls._instance_lock = asyncio.Lock()
+        if cls._instance is None:
+            async with cls._instance_lock:
+                if cls._instance is None:
+                    runtime = cls(config_path, planner_prompt_path, command_prompt_path, openai_factory())
+                    await runtime.refresh(force=True)
+                    cls._instance = runtime
+                    if not cls._exit_hook_registered:
+                        # The Functions host never calls shutdown, so the pooled session is closed when the worker exits.
+                        atexit.register(cls._close_at_exit)
+                        cls._exit_hook_registered = True
+        await cls._instance.refresh()
+        return cls._instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop the shared runtime so the next request rebuilds it."""
+        cls._instance = None
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """Close the shared HTTP transport and drop the runtime."""
+        runtime, cls._instance = cls._instance, None
+        if runtime is not None:
+            await runtime.http_transport.close()
+
+    @classmethod
+    def _close_at_exit(cls) -> None:
+        runtime, cls._instance = cls._instance, None
+        if runtime is not None:
+            runtime.http_transport.close_at_exit()
+
+    async def refresh(self, force: bool = False) -> None:
+        """Reload the configuration and planner prompt if their files changed."""
+        now = time.monotonic()
+        if not force and now - self._last_checked < self.REFRESH_INTERVAL_SECONDS:
+            return
+        async with self._refresh_lock:
+            if not force and now - self._last_checked < self.REFRESH_INTERVAL_SECONDS:
+                return
+            config_fingerprint = get_file_fingerprint(self.config_path)
+            if force or config_fingerprint != self._config_fingerprint:
+                await self._reload_config()
+                self._config_fingerprint = config_fingerprint
+            prompt_fingerprint = get_file_fingerprint(self.planner_prompt_path)
+            if force or prompt_fingerprint != self._prompt_fingerprint:
+                self.planner_prompt = await SmartInvoker.load_planner_prompt(self.planner_prompt_path)
+                self._prompt_fingerprint = prompt_fingerprint
+                logging.info(f"Planner prompt loaded from {self.planner_prompt_path}")
+            planner_prefix = SmartInvoker.build_planner_prefix(self.planner_prompt, self.agent_catalog)
+            if planner_prefix != self.planner_prefix:
+                self.planner_prefix = planner_prefix
+            self._last_checked = time.monotonic()
+
+    async def _reload_config(self) -> None:
+        config = await SmartInvoker.load_config(self.config_path)
+        current = self.config
+        if current is None or not self._same_config_version(current, config) or current.agents != config.agents:
+            self.agents = await SmartInvoker.load_agents(config, self.http_transport)
+            self.agent_catalog = SmartInvoker.build_agent_catalog(config)
+            self.agent_retriever = self._build_agent_retriever(config)
+            logging.info(f"Agent registry built for configuration version {config.version} ({config.last_updated})")
+        elif current.cache == config.cache:
+            self.config = config
+            return
+        self.result_cache = self._build_result_cache(config)
+        self.plan_cache = self._build_plan_cache(config)
+        self.config = config
+
+    def _build_agent_retriever(self, config: SmartInvokerConfig) -> Optional[AgentRetriever]:
+        app_config = AppConfig.get_instance()
+        if not app_config.AGENT_RETRIEVAL_ENABLED:
+            return None
+        return AgentRetriever(config.agents, self.openai_utility, top_k=app_config.AGENT_RETRIEVAL_TOP_K)
+
+    @staticmethod
+    def _build_result_cache(config: SmartInvokerConfig) -> AgentResultCache:
+        cache_config = config.cache or {}
+        app_config = AppConfig.get_instance()
+        store = CacheFactory.create_tiered_cache(
+            namespace="agent-result",
+            max_entries=int(cache_config.get('max_entries', DEFAULT_MAX_ENTRIES)),
+            default_ttl=int(cache_config.get('ttl', DEFAULT_TTL)),
+            use_redis=app_config.USE_CACHE,
+            redis_host=app_config.REDIS_HOST,
+            redis_password=app_config.REDIS_PASSWORD
+        )
+        return AgentResultCache(cache_config, config.agents, store, config_version=config.version)
+
+    @staticmethod
+    def _build_plan_cache(config: SmartInvokerConfig) -> PlanCache:
+        plan_cache_config = (config.cache or {}).get('plan', {})
+        app_config = AppConfig.get_instance()
+        store = CacheFactory.create_tiered_cache(
+            namespace="plan",
+            max_entries=int(plan_cache_config.get('max_entries', DEFAULT_MAX_ENTRIES)),
+            default_ttl=int(plan_cache_config.get('ttl', DEFAULT_PLAN_TTL)),
+            use_redis=app_config.USE_CACHE,
+            redis_host=app_config.REDIS_HOST,
+            redis_password=app_config.REDIS_PASSWORD
+        )
+        return PlanCache(plan_cache_config, store)
+
+    @staticmethod
+    def _same_config_version(current: SmartInvokerConfig, new: SmartInvokerConfig) -> bool:
+        return (current.version, current.last_updated) == (new.version, new.last_updated)
+
+    async def create_invoker(self, request_data: RequestData) -> SmartInvoker:
+        """Create the per-request SmartInvoker on top of the shared state."""
+        if not request_data.Query:
+            raise ValueError("Query is required")
+        return SmartInvoker(
+            self.config, self.agents, self.planner_prompt, request_data,
+            self.command_prompt_path, self.openai_utility, agent_catalog=self.agent_catalog,
+            result_cache=self.result_cache, plan_cache=self.plan_cache, planner_prefix=self.planner_prefix,
+            agent_retriever=self.agent_retriever
+        )
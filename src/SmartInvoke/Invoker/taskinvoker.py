@@ -1,20 +1,40 @@
 from datetime import datetime  
+import itertools
 import json  
 import logging  
-from typing import Any, Dict, Optional, Callable, Tuple, Union  
+import os
+import time
+from typing import Any, Dict, List, Optional, Callable, Tuple, Union  
 import aiofiles  
 from pydantic import BaseModel, ValidationError  
 from dataclasses import dataclass  
 from common import (  
-    PluginLoader, AgentConfigLoader, ConfigurationError, Context, Task, Plan, PerformanceMonitor  
+    PluginLoader, AgentConfigLoader, ConfigurationError, Context, Task, Plan,
+    PlanError, PlanScheduler, PlanHalted
 )  
 from Config import AppConfig  
 from common import CommandProcessor, CommandProcessorError, RequestData, UserAction
-from common.functions import parse_responsejson, generate_cache_key
+from common.agent_result_cache import AgentResultCache
+from common.plan_cache import PlanCache
+from common.plan_stream import PlanStream, EXECUTE_ACTION_TYPE
+from common.plan_schema import normalize_step, plan_response_format, repair_plan
+from common.dependency_resolver import DependencyResolver
+from common.result_compactor import ResultCompactor
+from common.agent_retriever import AgentRetriever
+from common.http_transport import HttpTransport
+from common.tracing import TRACER
+from common.log_pipeline import log_event
+from common.metrics import AGENT_CALLS, AGENT_DURATION, CACHE_REQUESTS, CIRCUIT_OPEN, PLANNER_OUTPUTS
+from circuitbreaker import CircuitBreakerError
+from common.prompt_cache import PROMPT_CACHE
 from common.openai_utils import OpenAIUtility
 from userprofiles import UserProfile  
 from agents import InteractiveAgent
 
+COMMAND_ACTION_TYPE = "Command"
+COMMAND_PLANNING_PROMPT_FILE = 'command_planning_prompt.txt'
+INVALID_PLAN_MESSAGE = "We couldn't work out how to handle your request. Please rephrase it and try again."
+
 class TaskExecutionError(Exception):  
     """Exception raised for errors in task execution."""  
     pass  
@@ -32,12 +52,21 @@ class SmartInvoker:
         self, config: SmartInvokerConfig, agents: Dict[str, Any], planner_prompt: str,   
         request_data: RequestData, 
         command_prompt_path: Optional[str] = None,
-        openai_utility: Optional[OpenAIUtility] = None  
+        openai_utility: Optional[OpenAIUtility] = None,
+        agent_catalog: Optional[str] = None,
+        result_cache: Optional[AgentResultCache] = None,
+        plan_cache: Optional[PlanCache] = None,
+        planner_prefix: Optional[str] = None,
+        agent_retriever: Optional[AgentRetriever] = None
     ):  
         self.config = config  
         self.agents = agents  
         self.planner_prompt = planner_prompt  
-        self.performance_monitor = PerformanceMonitor()  
+        self.agent_catalog = agent_catalog if agent_catalog is not None else self.build_agent_catalog(config)
+        self.planner_prefix = planner_prefix if planner_prefix is not None else self.build_planner_prefix(planner_prompt, self.agent_catalog)
+        self.result_cache = result_cache
+        self.plan_cache = plan_cache
+        self.agent_retriever = agent_retriever
         self.user_id = request_data.UserId  
         self.user_email = request_data.UserEmail  
         self.query = request_data.Query  
@@ -46,6 +75,8 @@ class SmartInvoker:
         self.openai_utility = openai_utility  
         self.is_show_plan_only = request_data.IsShowPlanOnly  
         self.include_user_profile_attributes = False  # Consider passing this from app config or request data  
+        self.result_compactor = ResultCompactor(AppConfig.get_instance().RESULT_COMPACTION_ENABLED)
+        self.dependency_resolver = DependencyResolver(openai_utility, self.request_id, self.result_compactor)
 
     @classmethod  
     async def create(  
@@ -78,7 +109,7 @@ class SmartInvoker:
         return prompt.strip()  
 
     @staticmethod  
-    async def load_agents(config: SmartInvokerConfig) -> Dict[str, Any]:  
+    async def load_agents(config: SmartInvokerConfig, http_transport: Optional[HttpTransport] = None) -> Dict[str, Any]:  
         agents = {}  
         retry_config = config.retry or {}  
         max_retries = retry_config.get('max_retries', 3)  
@@ -91,39 +122,45 @@ class SmartInvoker:
             else:
                 service_url=None
             agents[agent_name] = agent_class(  
-                agent_name, service_url, agent_info, max_retries, backoff_factor  
+                agent_name, service_url, agent_info, max_retries, backoff_factor, session=http_transport  
             )  
         return agents  
 
+    @staticmethod
+    def build_agent_catalog(config: SmartInvokerConfig, agent_names: Optional[List[str]] = None) -> str:
+        """Build the agent list injected into the planner prompt, optionally limited to ``agent_names``."""
+        catalog = ""
+        for agent_name in agent_names if agent_names is not None else config.agents:
+            details = config.agents[agent_name]
+            agent_description = details.get("AgentDescription", "")  
+            catalog += f"{agent_name}: {agent_description}\n"  
+            request_template = details.get("request_template", {})  
+            if request_template:  
+                if isinstance(request_template, list):  
+                    for template in request_template:  
+                        for key, value in template.items():  
+                            catalog += f"\t\t{key}: {value}\n"  
+                else:  
+                    for key, value in request_template.items():  
+                        catalog += f"\t\t{key}: {value}\n"  
+            catalog += "\n"  
+        return catalog
+
+    @staticmethod
+    def build_planner_prefix(planner_prompt: str, agent_catalog: str) -> str:
+        """Build the static part of the planner system prompt.
+
+        Only text that stays the same between requests belongs here, so that the
+        prefix can be served from the Azure OpenAI prompt cache.
+        """
+        return f"{planner_prompt}\n{agent_catalog}"
+
     async def resolve_dependencies(self, task: Task, completed_tasks: Dict[str, Any]) -> Union[Task, UserAction]:   
         """Resolve dependencies for the task using results from completed tasks."""  
-        if not task.dependencies:  
-            return task  
-
-        for dependency_param, dependency_step in task.dependencies:  
-            if dependency_step in completed_tasks:  
-                prompt = (  
-                    f"Your task is to identify the value of '{dependency_param}' from the below provided content. "  
-                    f"Don't return any other information other than the value of '{dependency_param}'. "  
-                    f"If you can't find the value of '{dependency_param}', please return 'not_found'."  
-                )
-
-                messages = [  
-                    {"role": "system", "content": prompt},  
-                    {"role": "user", "content": completed_tasks[dependency_step]}  
-                ] 
-                app_config = AppConfig.get_instance()
-                try: 
-                    result = await self.openai_utility.generate_completion(  
-                        prompt=messages, gpt_deployment_name=app_config.GPT_DEPLOYMENT_NAME, conversation_id=self.request_id ,ai_assistant=app_config.MODULE_NAME,max_token=2048 , request_id = self.request_id
-                    )  
-                    if result == "not_found":  
-                        raise TaskExecutionError(f"Dependency {dependency_param} not found in task {dependency_step}")  
-                    task.agent_payload[dependency_param] = result 
-                except Exception as e:  
-                    logging.error(f"Error resolving dependencies for task {task.step}: {e}", exc_info=True)  
-                    return UserAction(ActionType="UserMessage", Message=completed_tasks[dependency_step])  
-        return task  
+        if not task.dependencies:
+            return task
+        with TRACER.start_span("resolve_dependencies", {"task.step": task.step}):
+            return await self.dependency_resolver.resolve(task, completed_tasks)
 
     async def delegate_task(self, task: Task, context: Context, status_callback: Callable[[str], None]) -> Any:  
         """Delegate the task to the appropriate agent."""  
@@ -149,48 +186,116 @@ class SmartInvoker:
                             return user_message  
 
                 
-        cache_key = generate_cache_key(  
-            user_id=self.user_id, user_query=f'{task.agent_name}{json.dumps(task.agent_payload)}',   
-            is_permission_check_enabled=True  
-        )  
+        if not self.result_cache or isinstance(agent, InteractiveAgent) or not self.result_cache.can_share_calls(task.agent_name):
+            result = await self.perform_agent_task(agent, task, context)
+            status_callback(f"Step {task.step} completed")  
+            return result
+
+        app_config = AppConfig.get_instance()
+        cache_key = self.result_cache.build_key(
+            task.agent_name, task.agent_payload, self.user_id,
+            is_permission_check_enabled=app_config.IS_PERMISSION_CHECK_ENABLED
+        )
+        cache_ttl = self.result_cache.get_ttl(task.agent_name)
+        if cache_ttl:
+            cached_result = await self.result_cache.get(cache_key)
+            if cached_result:
+                cache_result = "stale" if cached_result.is_stale else "hit"
+                TRACER.set_attribute("agent.cache", cache_result)
+                CACHE_REQUESTS.inc(cache="agent_result", result=cache_result)
+                if cached_result.is_stale:
+                    logging.info(f"Serving stale result for agent {task.agent_name} in step {task.step} while refreshing")
+                    self.result_cache.inflight.start(cache_key, lambda: self.fetch_agent_result(agent, task, context, cache_key, cache_ttl))
+                else:
+                    logging.info(f"Cache hit for agent {task.agent_name} in step {task.step}")
+                status_callback(f"Step {task.step} completed")
+                return cached_result.result
+            CACHE_REQUESTS.inc(cache="agent_result", result="miss")
 
-        result = await agent.perform_task(context)  
-        if not result:
-            raise TaskExecutionError(f"We couldn't complete your request because the agent ({task.agent_name}) couldn't retrieve the necessary information in step {task.step}. Please try again or reach out for assistance.")
-        
+        result = await self.result_cache.inflight.do(cache_key, lambda: self.fetch_agent_result(agent, task, context, cache_key, cache_ttl))
         status_callback(f"Step {task.step} completed")  
         return result  
 
-    async def generate_plan(self) -> Union[Plan, UserAction]:  
-        """Generate the execution plan."""  
-        plan = Plan()  
+    async def fetch_agent_result(self, agent: Any, task: Task, context: Context, cache_key: str, cache_ttl: Optional[int]) -> Any:
+        """Call the agent and cache its result; shared between identical concurrent calls."""
+        result = await self.perform_agent_task(agent, task, context)
+        if cache_ttl:
+            await self.result_cache.set(cache_key, result, cache_ttl, self.result_cache.get_stale_ttl(task.agent_name))
+        return result
 
+    async def perform_agent_task(self, agent: Any, task: Task, context: Context) -> Any:
+        start_time = time.monotonic()
+        outcome = "error"
+        try:
+            result = await agent.perform_task(context)  
+            outcome = "success" if result else "empty"
+        except CircuitBreakerError:
+            CIRCUIT_OPEN.inc(agent=task.agent_name)
+            outcome = "circuit_open"
+            raise
+        finally:
+            AGENT_DURATION.observe(time.monotonic() - start_time, agent=task.agent_name)
+            AGENT_CALLS.inc(agent=task.agent_name, outcome=outcome)
+        if not result:
+            raise TaskExecutionError(f"We couldn't complete your request because the agent ({task.agent_name}) couldn't retrieve the necessary information in step {task.step}. Please try again or reach out for assistance.")
+        return result
+
+    async def generate_plan(self, include_commands: bool = False) -> Union[Plan, PlanStream, UserAction]:  
+        """Generate the execution plan.
+
+        With ``include_commands`` the planner may also classify the request as one of
+        the fixed commands, returned as a UserAction with ActionType "Command".
+        With STREAMING_PLANNER_ENABLED an Execute plan is returned as a PlanStream
+        as soon as the planner has chosen to execute, before its steps are written.
+        """  
+        with TRACER.start_span("planning", {"planning.include_commands": include_commands}) as span:
+            execution_plan = await self.request_plan(include_commands)
+            if isinstance(execution_plan, Plan):
+                span.set_attribute("plan.steps", len(execution_plan.get_tasks))
+            elif isinstance(execution_plan, PlanStream):
+                span.set_attribute("plan.streaming", True)
+            elif isinstance(execution_plan, UserAction):
+                span.set_attribute("plan.action", execution_plan.ActionType)
+            return execution_plan
+
+    async def request_plan(self, include_commands: bool = False) -> Union[Plan, PlanStream, UserAction]:  
+        user_profile_attributes = None
         if self.include_user_profile_attributes:  
             user_profile = UserProfile(self.user_id)  
             user_profile_attributes = await user_profile.get_user_profile_attributes()  
-        
+
+        current_date = datetime.now().strftime('%d %B %Y')
+        command_planning_prompt = await self.load_command_planning_prompt() if include_commands else ""
+        plan_cache_key = None
+        if self.plan_cache and self.plan_cache.enabled:
+            # The prompt carries the user id, which the planner writes into payloads and messages.
+            plan_cache_key = self.plan_cache.build_key(
+                self.query, self.planner_prefix + command_planning_prompt, self.config.version, self.config.last_updated,
+                current_date, user_id=self.user_id
+            )
+            cached_plan = await self.plan_cache.get(plan_cache_key)
+            if cached_plan:
+                logging.info("Plan cache hit")
+                TRACER.set_attribute("plan.cache", "hit")
+                CACHE_REQUESTS.inc(cache="plan", result="hit")
+                return self.build_plan(cached_plan, user_profile_attributes)
+            CACHE_REQUESTS.inc(cache="plan", result="miss")
+
+        planner_prefix = self.planner_prefix
+        if self.agent_retriever:
+            agent_names = await self.agent_retriever.select(self.query)
+            if agent_names is not None:
+                planner_prefix = self.build_planner_prefix(self.planner_prompt, self.build_agent_catalog(self.config, agent_names))
+
+        # Static text first and volatile fields last, so the prefix stays cacheable.
         prompt = (  
-            f"{self.planner_prompt}\n"  
+            f"{planner_prefix}"
+            f"{command_planning_prompt}"
             f"\n################### \n"
-            f"Current date is {datetime.now().strftime('%d %B %Y')}\n"  
+            f"Current date is {current_date}\n"  
             f"user Id is {self.user_id}\n"
-            f"\n################### \n"
         )  
 
-        for agent_name, details in self.config.agents.items():  
-            agent_description = details.get("AgentDescription", "")  
-            prompt += f"{agent_name}: {agent_description}\n"  
-            request_template = details.get("request_template", {})  
-            if request_template:  
-                if isinstance(request_template, list):  
-                    for template in request_template:  
-                        for key, value in template.items():  
-                            prompt += f"\t\t{key}: {value}\n"  
-                else:  
-                    for key, value in request_template.items():  
-                        prompt += f"\t\t{key}: {value}\n"  
-            prompt += "\n"  
-
         app_config = AppConfig.get_instance()  
 
         messages = [  
@@ -198,86 +303,172 @@ class SmartInvoker:
             {"role": "user", "content": self.query}  
         ]  
 
-        result = await self.openai_utility.generate_completion_json_format(prompt= messages,gpt_deployment_name= app_config.GPT_DEPLOYMENT_NAME,ai_assistant=app_config.MODULE_NAME,conversation_id=self.request_id , request_id = self.request_id)  
-        logging.info(result)
-        try:
-            json_data = parse_responsejson(result)  
-        except Exception as e:
-            if 'ActionType' not in result:
-                return UserAction("clarificationNeeded",result)
-            else:
-                logging.info("Retrying with generate_completion_json_format due to missing ActionType.")
-                result = await self.openai_utility.generate_completion_json_format(prompt= messages,
-                                                            gpt_deployment_name= app_config.GPT_DEPLOYMENT_NAME,
-                                                            ai_assistant=app_config.MODULE_NAME,
-                                                            conversation_id=self.request_id, request_id = self.request_id )  
-                try:
-                    json_data = parse_responsejson(result)  
-                except Exception as e:
-                    raise TaskExecutionError("Error executing plan: {e}")
+        response_format = self.planner_response_format()
+        if app_config.STREAMING_PLANNER_ENABLED and not self.is_show_plan_only:
+            plan_stream = self.stream_plan(messages, plan_cache_key, response_format, user_profile_attributes)
+            if await plan_stream.action_type() == EXECUTE_ACTION_TYPE:
+                return plan_stream
+            result = await plan_stream.read_all()
+        else:
+            result = await self.openai_utility.generate_completion_json_format(prompt= messages,gpt_deployment_name= app_config.GPT_DEPLOYMENT_NAME,ai_assistant=app_config.MODULE_NAME,conversation_id=self.request_id , request_id = self.request_id, response_format=response_format)  
+            log_event("plan", "Planner output", plan=result)
+        # Malformed output is repaired locally rather than sending the planner completion again.
+        json_data = self.parse_plan(result)
         if json_data is None:
-            return UserAction("clarificationNeeded",result)
-        
-        if json_data.get("ActionType") == "Execute":  
+            # The broken planner output is logged by parse_plan and never shown to the user.
+            raise TaskExecutionError(INVALID_PLAN_MESSAGE)
+
+        execution_plan = self.build_plan(json_data, user_profile_attributes)
+        if plan_cache_key and execution_plan is not None:
+            await self.plan_cache.set(plan_cache_key, json_data)
+        return execution_plan
+
+    def planner_response_format(self) -> Optional[Dict[str, Any]]:
+        """The JSON schema response format for the planner, when it is enabled and the API version supports it."""
+        if not AppConfig.get_instance().PLANNER_JSON_SCHEMA_ENABLED:
+            return None
+        if not self.openai_utility.supports_json_schema:
+            logging.info("PLANNER_JSON_SCHEMA_ENABLED needs a newer OPENAI_API_VERSION; using JSON mode")
+            return None
+        return plan_response_format(self.config.agents)
+
+    def parse_plan(self, result: str) -> Optional[Dict[str, Any]]:
+        """Validate the planner output, repairing it locally when it is malformed."""
+        outcome = repair_plan(result, self.config.agents)
+        PLANNER_OUTPUTS.inc(result=outcome.result)
+        TRACER.set_attribute("plan.validation", outcome.result)
+        if outcome.repairs:
+            log_event("plan", "Repaired planner output", level=logging.WARNING, repairs=outcome.repairs)
+        if outcome.data is None:
+            log_event("plan", "Invalid planner output", level=logging.WARNING, error=outcome.error)
+        return outcome.data
+
+    def stream_plan(self, messages: List[Dict[str, str]], plan_cache_key: Optional[str],
+                    response_format: Optional[Dict[str, Any]] = None,
+                    user_profile_attributes: Optional[Dict[str, str]] = None) -> PlanStream:
+        """Start a streamed planner completion whose steps become tasks as they are written."""
+        app_config = AppConfig.get_instance()
+        positions = itertools.count(1)
+
+        def build_streamed_task(item: Dict[str, Any]) -> Task:
+            try:
+                step, _ = normalize_step(item, next(positions), self.config.agents)
+            except ValueError as e:
+                raise PlanError(f"Invalid plan step: {e}")
+            return self.build_task(step, user_profile_attributes)
+
+        async def complete_plan(result: str, json_data: Any) -> None:
+            log_event("plan", "Planner output", plan=result, streamed=True)
+            if plan_stream.parser.action_type != EXECUTE_ACTION_TYPE:
+                # Any other answer is parsed by request_plan once the whole stream is read.
+                return
+            json_data = self.parse_plan(result)
+            if plan_cache_key and json_data is not None:
+                await self.plan_cache.set(plan_cache_key, json_data)
+
+        chunks = self.openai_utility.stream_completion_json_format(
+            prompt=messages, gpt_deployment_name=app_config.GPT_DEPLOYMENT_NAME, response_format=response_format
+        )
+        plan_stream = PlanStream(chunks, build_streamed_task, on_complete=complete_plan)
+        return plan_stream
+
+    def build_plan(self, json_data: Dict[str, Any], user_profile_attributes: Optional[Dict[str, str]] = None) -> Union[Plan, UserAction, None]:
+        """Build the plan from the planner output, adding this request's payload fields."""
+        if json_data.get("ActionType") == EXECUTE_ACTION_TYPE:  
+            plan = Plan()  
             for item in json_data.get("ExecutePlan", []):  
-                step = item["Step"]  
-                agent_name = item["Agent name"]  
-                agent_payload = item["Agent payload"]  
-                status_message = item["Status Message"]  
-                agent_payload['UserId'] = self.user_id  
-                agent_payload['UserEmail'] = self.user_email
-                agent_payload['OrigionalQuery']=self.query
-                if self.include_user_profile_attributes and user_profile_attributes:  
-                    agent_payload['UserProfileAttributes'] = json.dumps(user_profile_attributes)  
-                if self.request_id:  
-                    agent_payload['RequestId'] = self.request_id
-                dependencies = [  
-                    (dep["dependency_parameter"], dep["dependency_step"])   
-                    for dep in item.get("dependency", [])  
-                ]  
-
-                task = Task(step, agent_name, agent_payload, status_message, dependencies)  
-                plan.add_task(task)  
-
-            logging.info(f"Generated plan: {plan}")  
+                plan.add_task(self.build_task(item, user_profile_attributes))  
+
+            log_event("plan", "Generated plan", plan=plan)
             return plan  
 
         elif json_data.get("ActionType") in ("UserMessage", "ClarificationNeeded"):  
             return UserAction(**json_data)  
-
-    async def execute_plan(self, plan: Plan, status_callback: Callable[[str], None]) -> Any:  
-        """Execute the generated plan."""  
+        elif json_data.get("ActionType") == COMMAND_ACTION_TYPE:
+            return UserAction(ActionType=COMMAND_ACTION_TYPE, Message=json_data.get("Command", ""))
+        return None
+
+    def build_task(self, item: Dict[str, Any], user_profile_attributes: Optional[Dict[str, str]] = None) -> Task:
+        """Build the task for one ExecutePlan step, adding this request's payload fields."""
+        step = item["Step"]  
+        agent_name = item["Agent name"]  
+        agent_payload = dict(item["Agent payload"])
+        status_message = item["Status Message"]  
+        agent_payload['UserId'] = self.user_id  
+        agent_payload['UserEmail'] = self.user_email
+        agent_payload['OrigionalQuery']=self.query
+        if self.include_user_profile_attributes and user_profile_attributes:  
+            agent_payload['UserProfileAttributes'] = json.dumps(user_profile_attributes)  
+        if self.request_id:  
+            agent_payload['RequestId'] = self.request_id
+        dependencies = [  
+            (dep["dependency_parameter"], dep["dependency_step"])   
+            for dep in item.get("dependency", [])  
+        ]  
+        dependency_paths = {
+            dep["dependency_parameter"]: dep["dependency_path"]
+            for dep in item.get("dependency", [])
+            if dep.get("dependency_path") and isinstance(dep["dependency_parameter"], str)
+        }
+        return Task(step, agent_name, agent_payload, status_message, dependencies, dependency_paths=dependency_paths)
+
+    async def execute_plan(self, plan: Union[Plan, PlanStream], status_callback: Callable[[str], None]) -> Any:  
+        """Execute the generated plan, running independent steps concurrently.
+
+        A PlanStream is executed while the planner is still writing it: each step
+        starts as soon as it has been written and its dependencies have completed.
+        """  
+        plan_stream = None
+        if isinstance(plan, PlanStream):
+            plan_stream, plan = plan, plan.plan
         context = Context()  
         context.set('query', 'test query')  
         completed_tasks = {} 
         combined_results = {}  
- 
+
+        async def run_task(task: Task) -> None:
+            with TRACER.start_span("task", {"task.step": task.step, "agent.name": task.agent_name}):  
+                resolved_task = await self.resolve_dependencies(task, completed_tasks)  
+                if isinstance(resolved_task, UserAction):  
+                    raise PlanHalted(resolved_task.Message)
+                status_callback(f"🏃‍♂️ Executing Agent {resolved_task.agent_name} for step {resolved_task.step}")
+                result = await self.delegate_task(resolved_task, resolved_task.get_agent_payload(), status_callback)  
+                resolved_task.set_result(result)  
+                completed_tasks[resolved_task.step] = result
+                log_event("agent_response", "Step completed", step=resolved_task.get_step(), agent=resolved_task.agent_name, result=result)
+
+                if task.agent_name == "UserProxyAgent":
+                    status_callback(f"invoking UserProxyAgent for step {resolved_task.step}")
+                    raise PlanHalted(result)
+
+        app_config = AppConfig.get_instance()
+        try:
+            scheduler = PlanScheduler(plan, max_concurrency=app_config.MAX_PARALLEL_TASKS)
+            with TRACER.start_span("execute_plan", {"plan.streaming": plan_stream is not None}) as span:
+                finished_tasks = {id(task) for task in await scheduler.run(run_task, task_source=plan_stream)}
+                span.set_attribute("plan.steps", len(plan.get_tasks))
+        except PlanHalted as halted:
+            return halted.value
+        except PlanError as e:
+            raise TaskExecutionError(str(e))
+        finally:
+            if plan_stream is not None:
+                await plan_stream.close()
+        if plan_stream is not None:
+            log_event("plan", "Generated plan", plan=plan)
 
         for task in plan:  
-            if task.is_ready(completed_tasks.keys()):  
-                with self.performance_monitor.monitor(task):  
-                    resolved_task = await self.resolve_dependencies(task, completed_tasks)  
-                    if isinstance(resolved_task, UserAction):  
-                        return resolved_task.Message
-                    status_callback(f"🏃‍♂️ Executing Agent {resolved_task.agent_name} for step {resolved_task.step}")
-                    result = await self.delegate_task(resolved_task, resolved_task.get_agent_payload(), status_callback)  
-                    resolved_task.set_result(result)  
-                    context.data['result'] = result  # Update context with the result of the task  
-                    completed_tasks[resolved_task.step] = result
-                    logging.info(f"Step {resolved_task.get_step()} - Task {resolved_task.agent_name} .result: {result}") 
-                    
-                    if task.agent_name == "UserProxyAgent":
-                        status_callback(f"invoking UserProxyAgent for step {resolved_task.step}")
-                        return result 
-                    # Combine results only for tasks without dependencies  
-                    if not task.dependencies:  
-                        combined_results[f'Step {resolved_task.step}:{resolved_task.status_message}'] = result  
-                    
-
-        self.performance_monitor.report()  
+            if id(task) in finished_tasks:
+                context.data['result'] = task.get_result()  # Result of the last step in plan order
+                # Combine results only for tasks without dependencies  
+                if not task.dependencies:  
+                    combined_results[f'Step {task.step}:{task.status_message}'] = task.get_result()  
+
         if len(combined_results) > 1:  
-            combined_results_str = json.dumps(combined_results, indent=2)  
-            logging.info(f"Combined results of tasks without dependencies: {combined_results_str}")  
+            combined_results_str = self.result_compactor.compact_results(
+                combined_results, AppConfig.get_instance().MULTI_STEP_TOKEN_BUDGET, "multi_step"
+            )
+            log_event("agent_response", "Combined results of tasks without dependencies", results=combined_results_str)
             combined_processed_result= await self.process_multi_step_result(combined_results_str)
             if combined_processed_result:
                 return combined_processed_result
@@ -287,6 +478,11 @@ class SmartInvoker:
         else:
             return context.data.get('result', "No data found")  
 
+    async def load_command_planning_prompt(self) -> str:
+        """Load the planner section that describes the Command action type."""
+        prompt_dir = os.path.dirname(self.command_prompt_path or "")
+        return await PROMPT_CACHE.read(os.path.join(prompt_dir, COMMAND_PLANNING_PROMPT_FILE))
+
     async def review_session_history(self):  
         """Review the session history."""  
         pass  
@@ -308,10 +504,9 @@ class SmartInvoker:
                 {"role": "user", "content": result}  
             ] 
 
-            logging.info("------------------------------------------") 
             
             finalresult = await self.openai_utility.generate_completion(prompt= messages,gpt_deployment_name= app_config.GPT_DEPLOYMENT_NAME,ai_assistant=app_config.MODULE_NAME,conversation_id=self.request_id , request_id = self.request_id)  
-            logging.info(finalresult)
+            log_event("response", "Combined multi-step response", response=finalresult)
             if finalresult :
                 return finalresult
             return None
@@ -319,25 +514,45 @@ class SmartInvoker:
             logging.info(f"Error combining result from multi step- {e}")
             return None
 
-    async def process_command(self):  
-        """Process the command."""  
-        command_processor = CommandProcessor(  
+    def create_command_processor(self) -> CommandProcessor:
+        return CommandProcessor(  
             request_id=self.request_id, user_id=self.user_id, user_request=self.query,   
             prompt_library_path=self.command_prompt_path,   
             openai_utility=self.openai_utility  
         )  
-        return await command_processor.validate_and_extract_command()  
+
+    async def process_command(self):  
+        """Process the command."""  
+        with TRACER.start_span("command_processing"):
+            return await self.create_command_processor().validate_and_extract_command()  
 
     async def handle_request(self, request: Any, status_callback: Callable[[str], None]) -> Tuple[str, str]:
         """Handle the incoming request."""  
         try:  
             app_config = AppConfig.get_instance()  
-            if app_config.PROCESS_COMMANDS:  
+            include_commands = False
+            if app_config.PROCESS_COMMANDS and app_config.COMBINED_COMMAND_PLANNING:
+                # The planner classifies ambiguous requests as commands in the same completion.
+                command_processor = self.create_command_processor()
+                local_command = command_processor.match_command_locally()
+                if local_command is None:
+                    include_commands = True
+                else:
+                    command_processing_result = await command_processor.execute_command(local_command)
+                    if command_processing_result:
+                        return command_processing_result, None
+            elif app_config.PROCESS_COMMANDS:  
                 command_processing_result = await self.process_command()  
                 if command_processing_result:  
                     return command_processing_result, None 
             status_callback ("🔄 Loading agents")
-            execution_plan = await self.generate_plan()  
+            execution_plan = await self.generate_plan(include_commands=include_commands)  
+            if include_commands and isinstance(execution_plan, UserAction) and execution_plan.ActionType == COMMAND_ACTION_TYPE:
+                command_processing_result = await command_processor.execute_command(execution_plan.Message)
+                if command_processing_result:
+                    return command_processing_result, None
+                logging.info(f"Planner returned unknown command {execution_plan.Message}; planning without commands")
+                execution_plan = await self.generate_plan()
             status_callback("✅ Execution plan generated")
             if isinstance(execution_plan, UserAction):  
                 return execution_plan.Message, None
@@ -346,6 +561,8 @@ class SmartInvoker:
                 return str(execution_plan),None  
 
             result = await self.execute_plan(execution_plan, status_callback)  
+            if isinstance(execution_plan, PlanStream):
+                execution_plan = execution_plan.plan
             agent_list =execution_plan.get_unique_agents()
             logging.info(f'agent_list - {agent_list}')
             return result ,agent_list
@@ -0,0 +1,7 @@
+import azure.functions as func
+from common.metrics import CONTENT_TYPE, REGISTRY
+
+
+async def main(req: func.HttpRequest) -> func.HttpResponse:
+    """Serve this worker's request, agent and LLM metrics in the Prometheus text format."""
+    return func.HttpResponse(REGISTRY.render(), status_code=200, headers={"Content-Type": CONTENT_TYPE})
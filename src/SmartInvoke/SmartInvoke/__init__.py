@@ -5,14 +5,17 @@ import logging
 from datetime import datetime, timezone  
 from typing import Any, Dict, Optional, Tuple
 import azure.functions as func  
-import aiofiles  
-from tabulate import tabulate
-from Invoker import SmartInvoker  
+from Invoker import SmartInvoker, InvokerRuntime
 from Config import AppConfig  
 from common import RequestData  
-import re
-from common.functions import count_tokens
+from common.tokenizer import approximate_message_tokens
+from common.json_extractor import try_extract_json
 from common.openai_utils import OpenAIUtility
+from common.prompt_cache import PROMPT_CACHE
+from common.cache_utils import CacheFactory
+from common.tracing import TRACER, create_span_exporter
+from common.metrics import REQUEST_DURATION, record_stage_duration
+from common.log_pipeline import STRUCTURED_LOG, LogPipeline, log_event, parse_sample_rates
 
 PROMPT_LIBRARY_DIR = 'prompt_library'  
 AGENT_LIBRARY_DIR = 'agent_library'  
@@ -23,41 +26,20 @@ COMMAND_PROMPT_FILE = 'command_validation_prompt.txt'
 RESPONSE_ENHANCEMENT_PROMPT_FILE = 'response_enhancement_prompt.txt'
 AVATAR_MODE_PROMPT="avatar_mode_prompt.txt"
 
+TRACER.add_span_listener(record_stage_duration)
+
 async def read_file_async(file_path: str) -> str:  
-    """Read a file asynchronously."""  
-    async with aiofiles.open(file_path, 'r') as f:  
-        return await f.read()  
+    """Read a file asynchronously, served from memory until it changes on disk."""  
+    return await PROMPT_CACHE.read(file_path)
     
 def clean_and_convert_to_dict(service_response):
-    try:
-        # Remove leading/trailing whitespace
-        service_response = service_response.strip()
-        
-        # Remove any backslashes not part of an escape sequence
-        service_response = re.sub(r'\\(?![nrt\\"\'b])', r'\\\\', service_response)
-        
-        # Replace escape sequences like \n, \t with space or appropriate character
-        service_response = re.sub(r'\\n', ' ', service_response)  # Replace \n with a space
-        service_response = re.sub(r'\\t', ' ', service_response)  # Replace \t with a space
-        
-        # Convert double backslashes to single (to address issues where backslashes are improperly escaped)
-        service_response = re.sub(r'\\\\', r'\\', service_response)
-        
-        # Handle any remaining unescaped characters
-        service_response = re.sub(r'[\x00-\x1F]+', '', service_response)
-        
-        # Now try to load the cleaned string into a JSON object
-        response_dict = json.loads(service_response)
-        
-        return response_dict
-
-    except json.JSONDecodeError as e:
-        return None 
+    # Repairs stray backslashes and control characters in the same pass that finds the object
+    return try_extract_json(service_response, embedded=False)
     
 async def parse_response(service_response: str) -> Tuple[Any, Optional[Any], Optional[Any], Optional[Any]]:  
     """Parse the JSON response from a service."""  
     try:  
-        logging.info(f"service response is : {service_response}")
+        log_event("agent_response", "Service response", response=service_response)
         
         # Extract and clean the dictionary
         response_dict = clean_and_convert_to_dict(service_response)
@@ -71,10 +53,8 @@ async def parse_response(service_response: str) -> Tuple[Any, Optional[Any], Opt
             text_response = response_dict['QueryResponse'] if 'QueryResponse' in response_dict else ''
         response_type = response_dict['ResponseType'] if 'ResponseType' in response_dict else ''            
         image_base64 = response_dict['GraphResponse'] if 'GraphResponse' in response_dict else ''
-        # Log the extracted values
-        logging.info(f"text response is : {text_response}")
-        logging.info(f"response type is : {response_type}")
-        logging.info(f"image base64 is : {image_base64}")
+        log_event("agent_response", "Parsed service response", text_response=text_response,
+                  response_type=response_type, image_chars=len(image_base64 or ""))
         return text_response, response_type, image_base64
           
     except json.JSONDecodeError as e:  
@@ -86,8 +66,30 @@ def get_app_config() -> AppConfig:
     """Get application configuration."""  
     return AppConfig.get_instance()  
 
+_logging_configured = False
+
+def configure_logging(appconfig: AppConfig) -> None:  
+    """Apply the log size caps and sampling, and start the log pipeline when enabled; once per worker."""  
+    global _logging_configured
+    if _logging_configured:
+        return
+    STRUCTURED_LOG.configure(appconfig.LOG_MAX_FIELD_CHARS, parse_sample_rates(appconfig.LOG_SAMPLE_RATES))
+    if appconfig.LOG_PIPELINE_ENABLED:
+        LogPipeline.start()
+    _logging_configured = True
+
 def initialize_openai_utility(appconfig: AppConfig) -> OpenAIUtility:  
     """Initialize OpenAI utility based on application configuration."""  
+    completion_cache = None
+    if appconfig.COMPLETION_CACHE_ENABLED:
+        completion_cache = CacheFactory.create_tiered_cache(
+            namespace="completion",
+            max_entries=appconfig.COMPLETION_CACHE_MAX_ENTRIES,
+            default_ttl=appconfig.COMPLETION_CACHE_TTL,
+            use_redis=appconfig.USE_CACHE,
+            redis_host=appconfig.REDIS_HOST,
+            redis_password=appconfig.REDIS_PASSWORD
+        )
     return OpenAIUtility(  
         openai_api_base=appconfig.OPENAI_API_BASE,  
         openai_api_key=appconfig.OPENAI_API_KEY,  
@@ -95,8 +97,13 @@ def initialize_openai_utility(appconfig: AppConfig) -> OpenAIUtility:
         cosmos_endpoint=None,
         cosmos_key=None,
         cosmos_container_name=None,
-        cosmos_database_name=None
-    )  
+        cosmos_database_name=None,
+        requests_per_minute=appconfig.OPENAI_RPM_LIMIT,
+        tokens_per_minute=appconfig.OPENAI_TPM_LIMIT,
+        openai_endpoints=appconfig.OPENAI_ENDPOINTS,
+        completion_cache=completion_cache,
+        completion_cache_ttl=appconfig.COMPLETION_CACHE_TTL
+    )
 
 
 async def generate_next_query_suggestion(current_question: str, current_response: str, suggestion_prompt_file_path: str, openai_utility: OpenAIUtility, request_data: RequestData, appconfig: AppConfig) -> str:  
@@ -125,33 +132,22 @@ async def handle_request(Invoker: SmartInvoker, request: Dict[str, Any], request
         end_time: datetime = datetime.now(timezone.utc)  
 
         duration: float = (end_time - start_time).total_seconds()  
-        logdata: list = [  
-            ["UserId", request_data.UserId],  
-            ["UserEmail", request_data.UserEmail],  
-            ["Query", request_data.Query],  
-            ["Duration (Sec)", duration]  
-        ]  
-        log_message: str = tabulate(logdata, tablefmt="grid")  
-        logging.info(f'\n{log_message}\n')  
+        log_event("request", "Request handled", user_id=request_data.UserId, user_email=request_data.UserEmail,
+                  query=request_data.Query, duration_sec=duration)
 
         if request_data.IsShowPlanOnly:  
             return func.HttpResponse(response, status_code=200)  
 
         query_response, response_type, image_base64data  = await parse_response(response)  
-        next_query_suggestion = await generate_next_query_suggestion(  
-            request_data.Query, query_response, suggestion_prompt_file_path, openai_utility, request_data, appconfig  
-        )  
         if agent_list and agent_list != "UserProxyAgent":
             telemterydata= f"\n ⏱ **Exec Time:** {duration:.0f} sec  |  🤖 **Agents Involved:** {agent_list}" if agent_list else f"\n \n ⏱ **Exec Time:** {duration:.0f} sec"
         else :
             telemterydata=""
 
-        if request_data.RequestId == 'acs':
-            query_response=await avatar_response(request_data.Query,query_response,openai_utility, request_data)
-        else:
-            query_response = await refine_response(request_data, openai_utility, query_response)
-        
-        
+        query_response, next_query_suggestion = await post_process_response(
+            query_response, suggestion_prompt_file_path, openai_utility, request_data, appconfig
+        )
+
         responsejson = {  
             "Question": request_data.Query,  
             "Answer": query_response,  
@@ -173,15 +169,49 @@ async def handle_request(Invoker: SmartInvoker, request: Dict[str, Any], request
         logging.exception('Error handling request')  
         return func.HttpResponse("Oops! Something went wrong while handling your request. Please try again", status_code=500) 
 
+async def run_stage(stage_name: str, stage, timeout: float, fallback: Any) -> Any:
+    """Await a post-processing stage, returning the fallback if it fails or times out."""
+    with TRACER.start_span(stage_name) as span:
+        try:
+            return await asyncio.wait_for(stage, timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{stage_name} timed out after {timeout} seconds")
+            span.set_attribute("stage.timed_out", True)
+        except Exception as e:
+            logging.error(f"Error in {stage_name}: {e}")
+            span.record_error(e)
+        return fallback
+
+
+async def post_process_response(query_response: str, suggestion_prompt_file_path: str, openai_utility: OpenAIUtility, request_data: RequestData, appconfig: AppConfig) -> Tuple[str, str]:
+    """Refine the answer and generate the next query suggestion concurrently.
+
+    Both stages only need the parsed agent answer. Each has its own timeout; the
+    unrefined answer and an empty suggestion are used when a stage fails.
+    """
+    if request_data.RequestId == 'acs':
+        refinement = avatar_response(request_data.Query, query_response, openai_utility, request_data)
+    else:
+        refinement = refine_response(request_data, openai_utility, query_response)
+    suggestion = generate_next_query_suggestion(
+        request_data.Query, query_response, suggestion_prompt_file_path, openai_utility, request_data, appconfig
+    )
+    refined_response, next_query_suggestion = await asyncio.gather(
+        run_stage("response refinement", refinement, appconfig.RESPONSE_REFINEMENT_TIMEOUT, query_response),
+        run_stage("query suggestion", suggestion, appconfig.QUERY_SUGGESTION_TIMEOUT, "")
+    )
+    return refined_response, next_query_suggestion
+
+
 async def refine_response(request_data, openai_utility, query_response):
     try:
         messages = [
         {"role": "user", "content": query_response}
         ]
-        if count_tokens(messages)<1500:
-            logging.info(f'origional resposne :{query_response}')
+        if approximate_message_tokens(messages)<1500:
+            log_event("response", "Original response", response=query_response)
             query_response = await enhance_response(request_data.Query,query_response,openai_utility,request_data)
-            logging.info(f'enhanced response:{query_response}')
+            log_event("response", "Enhanced response", response=query_response)
         return query_response 
     except Exception as e:  
         return query_response
@@ -193,7 +223,7 @@ async def enhance_response(origional_question: str,response:str,openai_utility:
         response_prompt_file_path: str = os.path.join(current_dir, PROMPT_LIBRARY_DIR, RESPONSE_ENHANCEMENT_PROMPT_FILE) 
         response_enhancement_prompt = await read_file_async(response_prompt_file_path)
         system_prompt = (  
-            f"Current date is {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"  
+            f"Current date is {datetime.now().strftime('%Y-%m-%d')}\n"  
             f"user Id is {request_data.UserId}\n"
             f"{response_enhancement_prompt}\n"  
         ) 
@@ -217,7 +247,7 @@ async def avatar_response(origional_question: str,response:str,openai_utility: O
         response_prompt_file_path: str = os.path.join(current_dir, PROMPT_LIBRARY_DIR, AVATAR_MODE_PROMPT) 
         avata_mode_prompt = await read_file_async(response_prompt_file_path)
         system_prompt = (  
-            f"Current date is {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"  
+            f"Current date is {datetime.now().strftime('%Y-%m-%d')}\n"  
             f"user Id is {request_data.UserId}\n"
             f"{avata_mode_prompt}\n"  
         ) 
@@ -239,7 +269,6 @@ async def Invoker(req: func.HttpRequest) -> func.HttpResponse:
 
     try:  
         appconfig: AppConfig = get_app_config()  
-        openai_utility = initialize_openai_utility(appconfig)  
 
         current_dir: str = os.getcwd()  
         suggestion_prompt_file_path: str = os.path.join(current_dir, PROMPT_LIBRARY_DIR, SUGGESTION_PROMPT_FILE)  
@@ -249,19 +278,28 @@ async def Invoker(req: func.HttpRequest) -> func.HttpResponse:
 
         request: Dict[str, Any] = req.get_json()  
         request_data = RequestData(**request)  
+        if TRACER.exporter is None:
+            TRACER.exporter = create_span_exporter(appconfig.TRACING_EXPORTER, appconfig.TRACING_FILE_PATH)
+        configure_logging(appconfig)
 
-        Invoker: SmartInvoker = await SmartInvoker.create(  
+        runtime: InvokerRuntime = await InvokerRuntime.get_instance(  
             config_path=config_file_path,  
-            planner_prompt_file_path=planner_file_path,  
-            request_data=request_data,  
+            planner_prompt_path=planner_file_path,  
             command_prompt_path=command_file_path,  
-            openai=openai_utility
+            openai_factory=lambda: initialize_openai_utility(appconfig)
         )  
+        openai_utility = runtime.openai_utility
+        Invoker: SmartInvoker = await runtime.create_invoker(request_data)  
 
         def status_callback(status: str) -> None:  
             logging.info(f'\n********\nStatus update: {status}\n*******\n')  
 
-        return await handle_request(Invoker, request, request_data, status_callback, appconfig, suggestion_prompt_file_path, openai_utility)  
+        start_time: datetime = datetime.now(timezone.utc)
+        with TRACER.start_trace("invoke", {"request.id": request_data.RequestId, "enduser.id": request_data.UserId}) as span:
+            response = await handle_request(Invoker, request, request_data, status_callback, appconfig, suggestion_prompt_file_path, openai_utility)  
+            span.set_attribute("http.response.status_code", response.status_code)
+        REQUEST_DURATION.observe((datetime.now(timezone.utc) - start_time).total_seconds(), status=str(response.status_code))
+        return response
 
     except json.JSONDecodeError as e:  
         logging.error(f'JSON decode error: {e}')  
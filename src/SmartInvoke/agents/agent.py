@@ -5,6 +5,8 @@ import logging
 from abc import ABC, abstractmethod  
 from circuitbreaker import circuit  
 from tenacity import retry, stop_after_attempt, wait_exponential  
+from common.functions import async_get_service_response
+from common.metrics import record_retry
 logger = logging.getLogger(__name__)  
 
 class BaseAgent(ABC):  
@@ -16,6 +18,7 @@ class BaseAgent(ABC):
         self.service_url = service_url  
         self.max_retries = max_retries or self.MAX_RETRIES  
         self.backoff_factor = backoff_factor or self.BACKOFF_FACTOR  
+        self.session = session  
         self.is_initialized = False  
         self.message_queue = asyncio.Queue()  
 
@@ -51,11 +54,11 @@ class BaseAgent(ABC):
     async def perform_task(self, context):  
         pass  
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))  
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=record_retry("agent"))  
     @circuit(failure_threshold=3, recovery_timeout=10)  
     async def call_service(self, context):  
         logging.info(f"Calling service {self.service_url} Context {json.dumps(context)}")  
-        response = await async_get_service_response(self.service_url, context)  
+        response = await async_get_service_response(self.service_url, context, transport=self.session)  
         return response  
 
     async def send_message(self, target_agent, message):  
@@ -6,6 +6,7 @@ from Config import AppConfig
 from azure.identity import DefaultAzureCredential
 from azure.core.credentials import AccessToken
 from common.functions import async_get_service_response
+from common.hedging import Hedger, HedgingBudget
  
 class AuthTypeNotSupported(Exception):  
     pass  
@@ -17,6 +18,9 @@ class DynamicAgent(BaseAgent):
             self.authentication = agent_info.get('authentication', {})  
             self.request_template = agent_info.get('request_template', {})  
             self.required_fields = agent_info.get('required_fields', []) 
+        hedging_config = agent_info.get('hedging') if agent_info else None
+        budget = HedgingBudget.shared(AppConfig.get_instance().HEDGING_BUDGET_RATIO) if hedging_config else None
+        self.hedger = Hedger(name, hedging_config, budget)
   
     @property  
     def agent_authentication(self):  
@@ -52,7 +56,9 @@ class DynamicAgent(BaseAgent):
         request_data = await self.quote_values(request_data)  
         request_data = json.dumps(request_data)
 
-        response = await async_get_service_response(service_url, request_data)  
+        response = await self.hedger.run(
+            lambda: async_get_service_response(service_url, request_data, transport=self.session)
+        )  
   
         # Process any incoming messages  
         await self.process_messages()  
@@ -4,7 +4,7 @@ from .agent import BaseAgent
 logger = logging.getLogger(__name__)  
 
 class InteractiveAgent(BaseAgent):  
-    def __init__(self, name, service_url=None, max_retries=None, backoff_factor=None, session=None):  
+    def __init__(self, name, service_url=None, agent_info=None, max_retries=None, backoff_factor=None, session=None):  
         super().__init__(name, service_url, max_retries, backoff_factor, session)  
 
     async def perform_task(self, context):  
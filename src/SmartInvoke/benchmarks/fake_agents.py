@@ -0,0 +1,89 @@
+import asyncio
+import importlib.util
+import os
+import random
+from typing import Any, Callable, Dict, Optional
+
+import azure.functions as func
+from aiohttp import web
+
+SOURCE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Function folders of the sample agent apps served by the fake agent server.
+AGENT_FUNCTIONS = {
+    "TechlabsDirectoryService": os.path.join("Agent1", "TechlabsDirectoryService"),
+    "FlightAvailabilityCheckService": os.path.join("Agent2", "FlightAvailabilityCheckService"),
+    "LeaveManagementService": os.path.join("Agent3", "LeaveManagementService"),
+}
+
+
+def load_agent_function(function_name: str) -> Callable[[func.HttpRequest], func.HttpResponse]:
+    """Import the ``main`` handler of one of the sample agent function apps."""
+    path = os.path.join(SOURCE_DIR, AGENT_FUNCTIONS[function_name], "__init__.py")
+    spec = importlib.util.spec_from_file_location(f"benchmark_agent_{function_name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.main
+
+
+class FakeAgentServer:
+    """Serves the Agent1-Agent3 function handlers over HTTP with added latency.
+
+    ``error_rate`` of the calls fail with a 503 before reaching the handler,
+    which exercises the agent retries and circuit breakers.
+    """
+
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.handlers = {name: load_agent_function(name) for name in AGENT_FUNCTIONS}
+        self.stats: Dict[str, int] = {name: 0 for name in AGENT_FUNCTIONS}
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/api/{function}", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.create_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def service_url(self, function_name: str) -> str:
+        return f"{self.url}/api/{function_name}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        function_name = request.match_info["function"]
+        handler = self.handlers.get(function_name)
+        if handler is None:
+            return web.Response(status=404)
+        self.stats[function_name] += 1
+        delay = max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay / 1000)
+        if self.random.random() < self.error_rate:
+            return web.Response(status=503, reason="Service Unavailable")
+        http_request = func.HttpRequest(
+            method=request.method,
+            url=str(request.url),
+            headers=dict(request.headers),
+            params=dict(request.query),
+            body=await request.read()
+        )
+        response: Any = handler(http_request)
+        return web.Response(
+            body=response.get_body(),
+            status=response.status_code,
+            content_type=response.mimetype or "application/json"
+        )
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from common.rate_limiter import estimate_prompt_tokens
+
+EMBEDDING_DIMENSIONS = 64
+STREAM_CHUNK_CHARS = 16
+# Share of the latency spent before the first streamed chunk; the rest is spread over the chunks.
+FIRST_CHUNK_LATENCY_SHARE = 0.2
+DEFAULT_ANSWER = "Here is the information you asked for."
+RATE_LIMIT_HEADERS = {"x-ratelimit-remaining-requests": "1000", "x-ratelimit-remaining-tokens": "1000000"}
+
+
+class FakeOpenAIServer:
+    """Local stand-in for the Azure OpenAI chat completions and embeddings API.
+
+    JSON mode and JSON schema completions are answered with the plan of the
+    scenario whose query starts the user message, so the planner output drives
+    real agent calls.
+    Every other completion gets a short canned answer. ``throttle_rate`` of the
+    requests are rejected with a 429 and a ``retry-after-ms`` header. Streamed
+    requests get their content as server-sent events spread over the latency.
+    """
+
+    def __init__(self, scenarios: List[Dict[str, Any]], latency_ms: float = 500, jitter_ms: float = 100,
+                 completion_tokens: int = 150, cached_token_ratio: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after_ms: int = 200, seed: Optional[int] = None):
+        self.scenarios = scenarios
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.completion_tokens = completion_tokens
+        self.cached_token_ratio = cached_token_ratio
+        self.throttle_rate = throttle_rate
+        self.retry_after_ms = retry_after_ms
+        self.random = random.Random(seed)
+        self.stats = {"chat": 0, "embeddings": 0, "throttled": 0}
+        self.runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/openai/deployments/{deployment}/chat/completions", self.chat_completions)
+        app.router.add_post("/openai/deployments/{deployment}/embeddings", self.embeddings)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.create_app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}/"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def sample_latency(self) -> float:
+        return max(0.0, self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    async def simulate_latency(self) -> None:
+        await asyncio.sleep(self.sample_latency())
+
+    def throttled_response(self) -> Optional[web.Response]:
+        if self.random.random() >= self.throttle_rate:
+            return None
+        self.stats["throttled"] += 1
+        body = {"error": {"code": "429", "message": "Requests to the deployment have exceeded the rate limit."}}
+        return web.json_response(body, status=429, headers={
+            "retry-after-ms": str(self.retry_after_ms),
+            "retry-after": str(max(1, self.retry_after_ms // 1000))
+        })
+
+    def find_scenario(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        query = next((message["content"] for message in reversed(messages) if message.get("role") == "user"), "")
+        for scenario in self.scenarios:
+            if query.startswith(scenario["query"]):
+                return scenario
+        return self.scenarios[0]
+
+    def completion_content(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages", [])
+        if (body.get("response_format") or {}).get("type") in ("json_object", "json_schema"):
+            return json.dumps(self.find_scenario(messages)["plan"])
+        system_prompt = next((message["content"] for message in messages if message.get("role") == "system"), "")
+        if "TextResponse" in system_prompt:
+            return json.dumps({"TextResponse": DEFAULT_ANSWER, "AssociatedImageLink": "", "AssociatedVideoLink": ""})
+        return DEFAULT_ANSWER
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        self.stats["chat"] += 1
+        body = await request.json()
+        throttled = self.throttled_response()
+        if throttled is not None:
+            return throttled
+        if body.get("stream"):
+            return await self.stream_chat_completion(request, body)
+        await self.simulate_latency()
+        response = {
+            "id": f"chatcmpl-{self.stats['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.match_info["deployment"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self.completion_content(body)}
+            }],
+            "usage": self.usage(body)
+        }
+        return web.json_response(response, headers=RATE_LIMIT_HEADERS)
+
+    def usage(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt_tokens = estimate_prompt_tokens(body.get("messages", []))
+        completion_tokens = min(self.completion_tokens, body.get("max_tokens") or self.completion_tokens)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": int(prompt_tokens * self.cached_token_ratio)}
+        }
+
+    async def stream_chat_completion(self, request: web.Request, body: Dict[str, Any]) -> web.StreamResponse:
+        latency = self.sample_latency()
+        content = self.completion_content(body)
+        pieces = [content[start:start + STREAM_CHUNK_CHARS] for start in range(0, len(content), STREAM_CHUNK_CHARS)]
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", **RATE_LIMIT_HEADERS})
+        await response.prepare(request)
+        chunk = {"id": f"chatcmpl-{self.stats['chat']}", "object": "chat.completion.chunk", "created": int(time.time()),
+                 "model": request.match_info["deployment"]}
+
+        async def send(data: Dict[str, Any]) -> None:
+            await response.write(f"data: {json.dumps({**chunk, **data})}\n\n".encode("utf-8"))
+
+        await asyncio.sleep(latency * FIRST_CHUNK_LATENCY_SHARE)
+        for piece in pieces:
+            await send({"choices": [{"index": 0, "finish_reason": None, "delta": {"content": piece}}]})
+            await asyncio.sleep(latency * (1 - FIRST_CHUNK_LATENCY_SHARE) / len(pieces))
+        await send({"choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await send({"choices": [], "usage": self.usage(body)})
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        self.stats["embeddings"] += 1
+        body = await request.json()
+        throttled = self.throttled_response()
+        if throttled is not None:
+            return throttled
+        await self.simulate_latency()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = [{"object": "embedding", "index": index, "embedding": self.embed(text)} for index, text in enumerate(texts)]
+        tokens = sum(len(str(text)) // 4 for text in texts)
+        return web.json_response({
+            "object": "list",
+            "model": request.match_info["deployment"],
+            "data": data,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        })
+
+    @staticmethod
+    def embed(text: str) -> List[float]:
+        """A deterministic pseudo-embedding, so similar lookups keep returning the same agents."""
+        digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+        return [(digest[index % len(digest)] - 128) / 128 for index in range(EMBEDDING_DIMENSIONS)]
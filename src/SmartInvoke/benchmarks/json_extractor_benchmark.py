@@ -0,0 +1,97 @@
+"""Micro-benchmark for common.json_extractor on large agent payloads.
+
+Run from src/SmartInvoke::
+
+    python -m benchmarks.json_extractor_benchmark --number 50
+
+Compares the regex cleanup clean_and_convert_to_dict used to run and the
+find/rfind parse with its doubled-backslash retry that parse_responsejson used
+to do against the single pass extractor, on clean, fenced and broken payloads.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import timeit
+from typing import List, Optional
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if APP_ROOT not in sys.path:
+    sys.path.insert(0, APP_ROOT)
+
+from tabulate import tabulate
+
+from common import json_extractor
+
+
+def regex_cleanup(service_response):
+    service_response = service_response.strip()
+    service_response = re.sub(r'\\(?![nrt\\"\'b])', r'\\\\', service_response)
+    service_response = re.sub(r'\\n', ' ', service_response)
+    service_response = re.sub(r'\\t', ' ', service_response)
+    service_response = re.sub(r'\\\\', r'\\', service_response)
+    service_response = re.sub(r'[\x00-\x1F]+', '', service_response)
+    try:
+        return json.loads(service_response)
+    except json.JSONDecodeError:
+        return None
+
+
+def find_and_retry(result):
+    result = result.replace('json\n', '')
+    json_string = result[result.find('{'):result.rfind('}') + 1].strip()
+    try:
+        return json.loads(json_string)
+    except json.JSONDecodeError:
+        try:
+            return json.loads(result.replace('\\', '\\\\'))
+        except json.JSONDecodeError:
+            return None
+
+
+def build_payload(employees: int) -> str:
+    records = [{
+        "employeeId": f"E{index:05d}",
+        "displayName": f"Employee {index}",
+        "mail": f"employee{index}@contoso.com",
+        "jobTitle": "Software Engineer",
+        "manager": {"displayName": f"Manager {index % 50}", "mail": f"manager{index % 50}@contoso.com"},
+        "notes": "Works on the planner.\nPrefers \"async\" reviews.",
+    } for index in range(employees)]
+    return json.dumps({"status": "success", "TextResponse": "Found the employees.", "data": records}, indent=2)
+
+
+def variants(payload: str) -> List[tuple]:
+    broken = payload.replace('"Works on', '"Works in C:\\Planner on').replace("Prefers ", "Prefers\tit\\'s ")
+    return [
+        ("clean", payload),
+        ("fenced", f"Here is the result:\n```json\n{payload}\n```"),
+        ("broken escapes", broken),
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="JSON extraction micro-benchmark.")
+    parser.add_argument("--number", type=int, default=50, help="Calls per measurement.")
+    args = parser.parse_args(argv)
+
+    print(f"JSON backend: {'orjson' if json_extractor.orjson is not None else 'json'}")
+    rows = []
+    for employees in (10, 1000):
+        for variant, text in variants(build_payload(employees)):
+            cases = [
+                ("regex cleanup", lambda: regex_cleanup(text)),
+                ("find/rfind and retry", lambda: find_and_retry(text)),
+                ("extract_json", lambda: json_extractor.try_extract_json(text)),
+            ]
+            for name, case in cases:
+                parsed = case() is not None
+                seconds = timeit.timeit(case, number=args.number)
+                rows.append([f"{len(text):,}", variant, name, "yes" if parsed else "no",
+                             f"{seconds / args.number * 1e6:,.1f}"])
+    print(tabulate(rows, headers=["Payload chars", "Payload", "Parser", "Parsed", "Per call (us)"], tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    main()
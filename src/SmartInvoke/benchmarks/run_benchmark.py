@@ -0,0 +1,256 @@
+"""End-to-end load benchmark for the Invoker request path.
+
+Runs the Invoker function in-process against a fake Azure OpenAI server and the
+Agent1-Agent3 handlers served by a fake agent server, sweeps the request
+concurrency and reports throughput and latency percentiles per level.
+
+Run from src/SmartInvoke::
+
+    python -m benchmarks.run_benchmark --concurrency 1,8,32 --requests 200
+    python -m benchmarks.run_benchmark --update-baseline
+
+A run is compared against benchmarks/baseline.json and exits with status 1
+when throughput drops or p95 latency grows by more than ``--tolerance``, or
+when there is no baseline yet; record one with ``--update-baseline`` on the
+machine the comparisons run on.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENARIOS = os.path.join(BENCHMARK_DIR, "scenarios.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+if APP_ROOT not in sys.path:
+    sys.path.insert(0, APP_ROOT)
+
+import azure.functions as func
+from tabulate import tabulate
+
+from .fake_agents import AGENT_FUNCTIONS, FakeAgentServer
+from .fake_openai import FakeOpenAIServer
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load benchmark for the SmartInvoke request path.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels to sweep.")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each level.")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="JSON file with the queries and planner outputs.")
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--completion-tokens", type=int, default=150)
+    parser.add_argument("--cached-token-ratio", type=float, default=0.0, help="Share of prompt tokens reported as cached.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of OpenAI requests answered with a 429.")
+    parser.add_argument("--agent-latency-ms", type=float, default=200)
+    parser.add_argument("--agent-jitter-ms", type=float, default=50)
+    parser.add_argument("--agent-error-rate", type=float, default=0.0, help="Share of agent calls answered with a 503.")
+    parser.add_argument("--cache", action="store_true", help="Keep the plan and agent result caches of agent_config.json enabled.")
+    parser.add_argument("--streaming-planner", action="store_true", help="Stream the planner output and start steps as they arrive.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline.")
+    parser.add_argument("--output", help="Write the results of this run to a JSON file.")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))]
+
+
+def prepare_workdir(agent_server: FakeAgentServer, keep_cache: bool) -> str:
+    """Create a function app directory whose agent config points at the fake agent server.
+
+    The Invoker resolves its prompt and agent libraries from the working
+    directory, so the prompts are copied and the agent config is rewritten there.
+    """
+    workdir = tempfile.mkdtemp(prefix="smartinvoke-bench-")
+    shutil.copytree(os.path.join(APP_ROOT, "prompt_library"), os.path.join(workdir, "prompt_library"))
+    os.makedirs(os.path.join(workdir, "agent_library"))
+    with open(os.path.join(APP_ROOT, "agent_library", "agent_config.json"), encoding="utf-8") as config_file:
+        config = json.load(config_file)
+    for agent in config["agents"].values():
+        function_name = agent.get("service_url", "").rstrip("/").rsplit("/", 1)[-1]
+        if function_name in AGENT_FUNCTIONS:
+            agent["service_url"] = agent_server.service_url(function_name)
+    if not keep_cache:
+        config.setdefault("cache", {})["enabled"] = False
+        config["cache"].setdefault("plan", {})["enabled"] = False
+    with open(os.path.join(workdir, "agent_library", "agent_config.json"), "w", encoding="utf-8") as config_file:
+        json.dump(config, config_file, indent=2)
+    return workdir
+
+
+class OfflineSecretClient:
+    """Key Vault stand-in that has no secrets, so every unset setting falls back to its default."""
+
+    def get_secret(self, name: str):
+        raise KeyError(name)
+
+
+def configure_environment(openai_url: str, streaming_planner: bool = False) -> None:
+    """Point the app settings at the fake OpenAI server before AppConfig caches them."""
+    from common.app_configuration import BaseAppConfig
+
+    os.environ.update({
+        "OPENAI_API_BASE": openai_url,
+        "OPENAI_API_KEY": "benchmark",
+        "USE_CACHE": "False",
+        "STREAMING_PLANNER_ENABLED": str(streaming_planner),
+    })
+    BaseAppConfig._secret_client = OfflineSecretClient()
+
+
+def build_request(scenario: Dict[str, Any], index: int) -> func.HttpRequest:
+    body = {
+        "UserId": f"bench-user-{index % 10}",
+        "UserEmail": "bench@contoso.com",
+        "UserName": "Benchmark",
+        "Query": scenario["query"],
+        "RequestId": f"bench-{index}",
+    }
+    return func.HttpRequest(method="POST", url="/api/SmartInvoke", headers={"Content-Type": "application/json"},
+                            params={}, body=json.dumps(body).encode("utf-8"))
+
+
+async def run_level(invoke, scenarios: List[Dict[str, Any]], concurrency: int, total: int, offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for index in range(total):
+        queue.put_nowait(offset + index)
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            index = queue.get_nowait()
+            request = build_request(scenarios[index % len(scenarios)], index)
+            start = time.perf_counter()
+            try:
+                response = await invoke(request)
+                if response.status_code != 200:
+                    errors += 1
+            except Exception as e:
+                logging.error(f"Benchmark request {index} failed: {e}")
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """List the concurrency levels that regressed against the baseline."""
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline.get("results", [])}
+    for result in results:
+        expected = baseline_levels.get(result["concurrency"])
+        if expected is None:
+            continue
+        if result["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"concurrency {result['concurrency']}: throughput {result['throughput_rps']:.2f} rps "
+                               f"vs baseline {expected['throughput_rps']:.2f} rps")
+        if result["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"concurrency {result['concurrency']}: p95 {result['p95_ms']:.0f} ms "
+                               f"vs baseline {expected['p95_ms']:.0f} ms")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> int:
+    with open(args.scenarios, encoding="utf-8") as scenarios_file:
+        scenarios = json.load(scenarios_file)
+    openai_server = FakeOpenAIServer(scenarios, args.llm_latency_ms, args.llm_jitter_ms, args.completion_tokens,
+                                     args.cached_token_ratio, args.throttle_rate, seed=args.seed)
+    agent_server = FakeAgentServer(args.agent_latency_ms, args.agent_jitter_ms, args.agent_error_rate, seed=args.seed)
+    await openai_server.start()
+    await agent_server.start()
+    configure_environment(openai_server.url, args.streaming_planner)
+    workdir = prepare_workdir(agent_server, args.cache)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+
+    # Imported after the environment is set, as the app reads its settings on import.
+    from SmartInvoke import Invoker as invoke
+    from Invoker import InvokerRuntime
+
+    results = []
+    offset = 0
+    try:
+        for concurrency in [int(level) for level in args.concurrency.split(",") if level.strip()]:
+            await run_level(invoke, scenarios, concurrency, args.warmup, offset)
+            offset += args.warmup
+            results.append(await run_level(invoke, scenarios, concurrency, args.requests, offset))
+            offset += args.requests
+            # Each level starts from a fresh runtime, without the caches and connections of the previous one.
+            await InvokerRuntime.shutdown()
+    finally:
+        await InvokerRuntime.shutdown()
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+        await agent_server.stop()
+        await openai_server.stop()
+
+    rows = [[r["concurrency"], r["requests"], r["errors"], f"{r['throughput_rps']:.2f}",
+             f"{r['p50_ms']:.0f}", f"{r['p95_ms']:.0f}", f"{r['p99_ms']:.0f}"] for r in results]
+    print(tabulate(rows, headers=["Concurrency", "Requests", "Errors", "Throughput (rps)", "p50 (ms)", "p95 (ms)", "p99 (ms)"],
+                   tablefmt="grid"))
+    print(f"OpenAI requests: {openai_server.stats}  Agent calls: {agent_server.stats}")
+
+    run_data = {"settings": {key: value for key, value in vars(args).items()
+                             if key not in ("baseline", "update_baseline", "output", "log_level")},
+                "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(run_data, output_file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(run_data, baseline_file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"ERROR no baseline at {args.baseline}; record one with --update-baseline")
+        return 1
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get("settings", {}) != {key: value for key, value in run_data["settings"].items() if key in baseline.get("settings", {})}:
+        print("Warning: the baseline was recorded with different settings")
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
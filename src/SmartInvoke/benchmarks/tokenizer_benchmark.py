@@ -0,0 +1,72 @@
+"""Micro-benchmark for the token counting helpers in common.tokenizer.
+
+Run from src/SmartInvoke::
+
+    python -m benchmarks.tokenizer_benchmark --number 200
+
+Compares loading the encoding on every call, as count_tokens used to, with the
+cached encoding, per-field against batched counting, and the exact count
+against the character estimate used for gating decisions.
+"""
+import argparse
+import os
+import sys
+import timeit
+from typing import List, Optional
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if APP_ROOT not in sys.path:
+    sys.path.insert(0, APP_ROOT)
+
+import tiktoken
+from tabulate import tabulate
+
+from common import tokenizer
+
+MODEL = "gpt-4-0613"
+
+
+def uncached_count(messages) -> int:
+    encoding = tiktoken.encoding_for_model(MODEL)
+    return sum(len(encoding.encode(str(value))) for message in messages for value in message.values())
+
+
+def build_messages(size: int) -> List[dict]:
+    with open(os.path.join(APP_ROOT, "prompt_library", "planner_prompt.txt"), encoding="utf-8") as prompt_file:
+        planner_prompt = prompt_file.read()
+    return [
+        {"role": "system", "content": (planner_prompt * size)},
+        {"role": "user", "content": "Can you provide the details for the employee named Alice?"},
+        {"role": "assistant", "content": '{"status": "success", "data": {"firstName": "Alice"}}' * size},
+        {"role": "user", "content": "And the flights from New York to Los Angeles on 2025-03-10?"},
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Token counting micro-benchmark.")
+    parser.add_argument("--number", type=int, default=200, help="Calls per measurement.")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in (1, 10):
+        messages = build_messages(size)
+        page = " ".join(message["content"] for message in messages)
+        cases = [
+            ("encoding loaded per call", lambda: uncached_count(messages)),
+            ("cached encoding", lambda: tokenizer.count_message_tokens(messages, MODEL)),
+            ("cached, batch encode", lambda: sum(len(tokens) for tokens in tokenizer.get_encoding(MODEL).encode_batch(
+                [str(value) for message in messages for value in message.values()]))),
+            ("approximate", lambda: tokenizer.approximate_message_tokens(messages)),
+            ("split page into chunks", lambda: tokenizer.split_text_by_token(page, 512, 80, MODEL)),
+        ]
+        for name, case in cases:
+            case()
+            seconds = timeit.timeit(case, number=args.number)
+            rows.append([f"{len(page):,}", name, f"{seconds / args.number * 1e6:,.1f}"])
+    print(tabulate(rows, headers=["Prompt chars", "Case", "Per call (us)"], tablefmt="grid"))
+    print(f"Exact: {tokenizer.count_message_tokens(build_messages(1), MODEL)} tokens, "
+          f"approximate: {tokenizer.approximate_message_tokens(build_messages(1))} tokens")
+
+
+if __name__ == "__main__":
+    main()
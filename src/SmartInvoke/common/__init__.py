@@ -1,6 +1,7 @@
 from .context import Context
 from .performance_monitor import PerformanceMonitor
-from .plan import Plan
+from .plan import Plan, PlanError
+from .plan_scheduler import PlanScheduler, PlanHalted
 from .plugin_loader import PluginLoader
 from .task import Task
 from .agent_config_loader import AgentConfigLoader, ConfigurationError
@@ -13,6 +14,6 @@ from .constants import LLMModelConfiguration
 __all__ = [
     'RequestData', 'UserAction', 'AgentConfigLoader', 'ConfigurationError',
     'OpenAIUtility', 'LLMModelConfiguration',
-    'Context', 'PerformanceMonitor', 'Plan', 'PluginLoader', 'Task', 'CommandProcessor',
+    'Context', 'PerformanceMonitor', 'Plan', 'PlanError', 'PlanScheduler', 'PlanHalted', 'PluginLoader', 'Task', 'CommandProcessor',
     'CommandMessages', 'CommandProcessorError', 'Commands'
 ]
\ No newline at end of file
@@ -38,7 +38,7 @@ class AgentConfigLoader:
         if 'retry' not in config:  
             config['retry'] = {"max_retries": 3, "backoff_factor": 2}  
         if 'cache' not in config:  
-            config['cache'] = {"enabled": False, "ttl": 300}  
+            config['cache'] = {"enabled": False, "ttl": 300, "max_entries": 1024}  
         for agent_name, agent_info in config['agents'].items():  
             if 'module' not in agent_info or 'class' not in agent_info:  
                 raise ConfigurationError(f"Agent '{agent_name}' in {source} is missing 'module' or 'class' key.")  
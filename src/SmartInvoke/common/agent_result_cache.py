@@ -0,0 +1,106 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from .cache_utils import DEFAULT_TTL, TieredCache
+from .functions import generate_cache_key
+from .singleflight import SingleFlight
+
+# Payload fields added by the invoker for every request; they must not split the cache.
+# The caller's identity is left out too, as the key is scoped to the user instead.
+VOLATILE_PAYLOAD_FIELDS = ('UserId', 'UserEmail', 'RequestId', 'OrigionalQuery')
+
+
+@dataclass
+class CachedResult:
+    result: str
+    is_stale: bool = False
+
+
+class AgentResultCache:
+    """Caches ``agent.perform_task`` results according to the agent_config ``cache`` section.
+
+    The global section sets the default TTL and the in-process bound::
+
+        "cache": {"enabled": true, "ttl": 300, "max_entries": 1024}
+
+    and each agent can override it with its own ``cache`` entry, e.g.
+    ``{"enabled": false}`` for agents with side effects or ``{"ttl": 3600}``.
+
+    Results are cached per user, since agents receive the caller's identity
+    and may answer based on it. An agent whose answers do not depend on the
+    caller can share them between users with ``{"shared": true}``.
+
+    With ``"stale_while_revalidate": <seconds>`` an expired result is still
+    served for that long while it is refreshed in the background. Concurrent
+    identical calls to agents that are not disabled share one request through
+    ``inflight``.
+    """
+
+    def __init__(self, cache_config: Optional[Dict[str, Any]], agents_config: Dict[str, Any], store: TieredCache,
+                 config_version: Optional[str] = None):
+        cache_config = cache_config or {}
+        self.enabled = bool(cache_config.get('enabled', False))
+        self.default_ttl = int(cache_config.get('ttl', DEFAULT_TTL))
+        self.default_stale_ttl = int(cache_config.get('stale_while_revalidate', 0))
+        self.agents_config = agents_config
+        self.store = store
+        self.config_version = config_version or ""
+        self.inflight = SingleFlight("agent")
+
+    def get_ttl(self, agent_name: str) -> Optional[int]:
+        """Return the TTL for an agent's results, or None if they must not be cached."""
+        if not self.enabled:
+            return None
+        agent_cache = self.agents_config.get(agent_name, {}).get('cache', {})
+        if not agent_cache.get('enabled', True):
+            return None
+        ttl = int(agent_cache.get('ttl', self.default_ttl))
+        return ttl if ttl > 0 else None
+
+    def get_stale_ttl(self, agent_name: str) -> int:
+        agent_cache = self.agents_config.get(agent_name, {}).get('cache', {})
+        return int(agent_cache.get('stale_while_revalidate', self.default_stale_ttl))
+
+    def can_share_calls(self, agent_name: str) -> bool:
+        """Identical concurrent calls are shared unless the agent disables caching (e.g. for side effects)."""
+        return self.agents_config.get(agent_name, {}).get('cache', {}).get('enabled', True)
+
+    def is_shared(self, agent_name: str) -> bool:
+        """Whether the agent's results may be served to other users."""
+        return bool(self.agents_config.get(agent_name, {}).get('cache', {}).get('shared', False))
+
+    def build_key(self, agent_name: str, payload: Dict[str, Any], user_id: str, is_permission_check_enabled: bool) -> str:
+        stable_payload = {key: value for key, value in payload.items() if key not in VOLATILE_PAYLOAD_FIELDS}
+        user_query = f'{self.config_version}{agent_name}{json.dumps(stable_payload, sort_keys=True, default=str)}'
+        is_user_scoped = is_permission_check_enabled or not self.is_shared(agent_name)
+        return generate_cache_key(user_id=user_id, user_query=user_query, is_permission_check_enabled=is_user_scoped)
+
+    async def get(self, cache_key: str) -> Optional[CachedResult]:
+        cached = await self.store.get(cache_key)
+        if not cached:
+            return None
+        entry = json.loads(cached)
+        return CachedResult(entry['result'], is_stale=time.time() > entry['fresh_until'])
+
+    async def set(self, cache_key: str, result: Any, ttl: int, stale_ttl: int = 0) -> None:
+        if not self.is_cacheable_result(result):
+            return
+        entry = json.dumps({'result': result, 'fresh_until': time.time() + ttl})
+        await self.store.set(cache_key, entry, ttl + max(stale_ttl, 0))
+
+    @staticmethod
+    def is_cacheable_result(result: Any) -> bool:
+        """Only successful string responses are cached; agent error payloads are not."""
+        if not result or not isinstance(result, str):
+            return False
+        try:
+            parsed = json.loads(result)
+        except ValueError:
+            return True
+        if isinstance(parsed, dict) and 'error' in parsed:
+            logging.info("Agent returned an error payload; result not cached")
+            return False
+        return True
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .openai_utils import OpenAIUtility
+
+INTERACTIVE_AGENT_CLASS = "InteractiveAgent"
+
+
+def agent_document(agent_name: str, details: Dict[str, Any]) -> str:
+    """Text embedded for an agent: its name, description and request template fields."""
+    lines = [f"{agent_name}: {details.get('AgentDescription', '')}"]
+    for key in ("request_template", "request_templates"):
+        templates = details.get(key) or []
+        for template in templates if isinstance(templates, list) else [templates]:
+            lines.extend(f"{field}: {value}" for field, value in template.items() if field != "required_fields")
+    return "\n".join(lines)
+
+
+class AgentRetriever:
+    """Selects the agents relevant to a query by embedding similarity.
+
+    The agent documents are embedded once, on first use, into a row-normalized
+    matrix so every query costs one embedding call and one matrix product.
+    Interactive agents and agents configured with ``"always_include": true``
+    are always selected and do not count towards ``top_k``.
+    """
+
+    def __init__(self, agents_config: Dict[str, Dict[str, Any]], openai_utility: OpenAIUtility, top_k: int):
+        self.openai_utility = openai_utility
+        self.top_k = top_k
+        self.always_included = [
+            name for name, details in agents_config.items()
+            if details.get("always_include") or details.get("class") == INTERACTIVE_AGENT_CLASS
+        ]
+        self.agent_names = list(agents_config)
+        self.candidates = [name for name in agents_config if name not in self.always_included]
+        self.documents = [agent_document(name, agents_config[name]) for name in self.candidates]
+        self.matrix: Optional[np.ndarray] = None
+        self._build_lock = asyncio.Lock()
+
+    @property
+    def is_active(self) -> bool:
+        """Retrieval only pays off when there are more candidates than ``top_k``."""
+        return 0 < self.top_k < len(self.candidates)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    async def build(self) -> np.ndarray:
+        if self.matrix is None:
+            async with self._build_lock:
+                if self.matrix is None:
+                    embeddings = await self.openai_utility.generate_embeddings_batch_async(self.documents)
+                    self.matrix = self.normalize(np.asarray(embeddings, dtype=np.float32))
+                    logging.info(f"Embedded {len(self.documents)} agent descriptions for retrieval")
+        return self.matrix
+
+    async def select(self, query: str) -> Optional[List[str]]:
+        """Return the agent names to show the planner, in configuration order, or None for all agents."""
+        if not self.is_active:
+            return None
+        try:
+            matrix = await self.build()
+            query_vector = self.normalize(np.asarray(await self.openai_utility.generate_embeddings_async(query), dtype=np.float32))
+        except Exception as e:
+            logging.error(f"Agent retrieval failed, using the full agent catalog: {e}")
+            return None
+        scores = matrix @ query_vector
+        top_indexes = set(np.argpartition(-scores, self.top_k - 1)[:self.top_k].tolist())
+        selected = {self.candidates[index] for index in top_indexes}
+        logging.info(f"Agents selected for planning: {sorted(selected)}")
+        selected.update(self.always_included)
+        # Configuration order keeps the catalog text stable for the same selection.
+        return [name for name in self.agent_names if name in selected]
@@ -0,0 +1,215 @@
+import asyncio
+import base64
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import redis
+from azure.identity import DefaultAzureCredential
+from redis.credentials import CredentialProvider
+
+scope = "https://redis.azure.com/.default"
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300
+# Fetch a new token this long before the current one expires.
+TOKEN_REFRESH_MARGIN = 300
+
+
+class BaseCacheWrapper:
+    def read_from_cache(self, key):
+        raise NotImplementedError("read_from_cache method must be implemented in the derived class.")
+
+    def write_to_cache(self, key, value, expiration_time=None):
+        raise NotImplementedError("write_to_cache method must be implemented in the derived class.")
+
+    def delete(self, key):
+        raise NotImplementedError("delete method must be implemented in the derived class.")
+
+
+class InMemoryCacheWrapper(BaseCacheWrapper):
+    """Bounded least-recently-used cache with a per-entry expiration time."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, default_ttl: Optional[int] = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read_from_cache(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def write_to_cache(self, key, value, expiration_time=None):
+        ttl = expiration_time if expiration_time is not None else self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def extract_username_from_token(token):
+    base64_str = token.split('.')[1]
+    base64_str += "=" * (-len(base64_str) % 4)
+    jwt = json.loads(base64.b64decode(base64_str).decode('utf-8'))
+    return jwt['oid']
+
+
+class EntraIdCredentialProvider(CredentialProvider):
+    """Supplies a current Microsoft Entra ID token whenever redis-py opens a connection.
+
+    The Redis client is shared for the life of the worker, well past the hour
+    a token is valid, so the token is fetched again shortly before it expires
+    instead of being fixed as the password when the client is created.
+    """
+
+    def __init__(self, credential=None):
+        self.credential = credential or DefaultAzureCredential()
+        self._token = None
+        self._lock = threading.Lock()
+
+    def get_credentials(self):
+        with self._lock:
+            if self._token is None or self._token.expires_on - TOKEN_REFRESH_MARGIN <= time.time():
+                self._token = self.credential.get_token(scope)
+            token = self._token.token
+        return extract_username_from_token(token), token
+
+
+class RedisCacheWrapper(BaseCacheWrapper):
+    def __init__(self, redis_host, redis_password, use_ssl=True):
+        self.redis_client = self.Authenticate(redis_host, redis_password, use_ssl)
+
+    def Authenticate(self, redis_host, redis_password, use_ssl):
+        if redis_password is None or redis_password == "":
+            credential_provider = EntraIdCredentialProvider()
+            # Fail here rather than on the first cache call when no token can be had.
+            credential_provider.get_credentials()
+            return redis.StrictRedis(
+                host=redis_host,
+                port=6380,
+                credential_provider=credential_provider,
+                decode_responses=True,
+                ssl=use_ssl,
+                # Connections authenticated with an expired token are dropped by the server;
+                # the retry reconnects with a fresh one.
+                retry_on_error=[redis.exceptions.ConnectionError]
+            )
+        return redis.StrictRedis(
+            host=redis_host,
+            port=6380,
+            password=redis_password,
+            ssl=use_ssl,
+            decode_responses=True
+        )
+
+    def read_from_cache(self, key):
+        return self.redis_client.get(key)
+
+    def write_to_cache(self, key, value, expiration_time=None):
+        try:
+            if expiration_time:
+                self.redis_client.setex(key, expiration_time, value)
+            else:
+                self.redis_client.set(key, value)
+        except Exception as e:
+            logging.error(f"Error writing to cache: {e}")
+
+    def delete(self, key):
+        self.redis_client.delete(key)
+
+
+class TieredCache:
+    """Async facade over an in-process LRU backed by an optional Redis tier.
+
+    Reads hit the in-process tier first and fall back to Redis, promoting the
+    value on a hit. Redis calls run in the default executor so they never block
+    the event loop, and Redis failures are logged and treated as misses.
+    """
+
+    def __init__(self, memory: InMemoryCacheWrapper, remote: Optional[BaseCacheWrapper] = None, namespace: str = ""):
+        self.memory = memory
+        self.remote = remote
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get_local(self, key: str) -> Optional[str]:
+        """Read the in-process tier only, for callers that cannot await."""
+        return self.memory.read_from_cache(self._key(key))
+
+    def set_local(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self.memory.write_to_cache(self._key(key), value, ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        key = self._key(key)
+        value = self.memory.read_from_cache(key)
+        if value is not None or self.remote is None:
+            return value
+        try:
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(None, self.remote.read_from_cache, key)
+        except Exception as e:
+            logging.warning(f"Error reading {key} from remote cache: {e}")
+            return None
+        if value is not None:
+            self.memory.write_to_cache(key, value)
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        key = self._key(key)
+        self.memory.write_to_cache(key, value, ttl)
+        if self.remote is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.remote.write_to_cache, key, value, ttl)
+        except Exception as e:
+            logging.warning(f"Error writing {key} to remote cache: {e}")
+
+
+class CacheFactory:
+    _redis: Optional[RedisCacheWrapper] = None
+
+    @classmethod
+    def get_redis_cache(cls, redis_host: Optional[str], redis_password: Optional[str]) -> Optional[RedisCacheWrapper]:
+        """Return the shared Redis wrapper, or None when Redis is not configured or unreachable."""
+        if not redis_host:
+            return None
+        if cls._redis is None:
+            try:
+                cls._redis = RedisCacheWrapper(redis_host, redis_password)
+            except Exception as e:
+                logging.error(f"Unable to connect to Redis cache {redis_host}: {e}")
+                return None
+        return cls._redis
+
+    @classmethod
+    def create_tiered_cache(cls, namespace: str, max_entries: int, default_ttl: int, use_redis: bool,
+                            redis_host: Optional[str] = None, redis_password: Optional[str] = None) -> TieredCache:
+        remote = cls.get_redis_cache(redis_host, redis_password) if use_redis else None
+        return TieredCache(InMemoryCacheWrapper(max_entries, default_ttl), remote, namespace)
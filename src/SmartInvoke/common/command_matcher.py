@@ -0,0 +1,157 @@
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+NOT_FOUND = "notfound"
+
+# Words that make a query worth a closer look by the model even when it matches no command locally,
+# e.g. "delete all my conversation history" for "forget me".
+COMMAND_HINT_WORDS = frozenset({
+    "session", "topic", "context", "forget", "feedback", "history", "conversation", "ticket",
+    "support", "liked", "dislike", "disliked", "action"
+})
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_command_text(text: str) -> str:
+    text = _PUNCTUATION.sub(" ", text.casefold())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def common_prefix_length(first: str, second: str) -> int:
+    length = 0
+    for first_char, second_char in zip(first, second):
+        if first_char != second_char:
+            break
+        length += 1
+    return length
+
+
+def edit_distance(first: str, second: str) -> int:
+    """Levenshtein distance between two strings."""
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char)))
+        previous = current
+    return previous[-1]
+
+
+class CommandMatcher:
+    """Decides locally whether a user request is one of the fixed commands.
+
+    ``match`` returns the command when it is certain, ``NOT_FOUND`` when the
+    request is clearly not a command, and None when the request is ambiguous
+    and should be classified by the model.
+
+    Commands like ``set context hr`` and ``set context finance`` share a
+    prefix and differ only in the rest, so a typo is tolerated in that
+    distinguishing suffix only when the suffix is long enough to allow one and
+    the request is still closer to it than to any sibling's suffix.
+    """
+
+    MAX_COMMAND_WORDS = 6
+    TYPO_MAX_DISTANCE_RATIO = 0.15
+    AMBIGUOUS_SIMILARITY = 0.3
+
+    def __init__(self, commands: Iterable[str]):
+        self.commands: Dict[str, str] = {normalize_command_text(command): command for command in commands}
+        self._index: Dict[str, Set[str]] = {}
+        self._trigram_counts: Dict[str, int] = {}
+        # Length of the prefix each command shares with the most similar other command.
+        self._shared_prefix: Dict[str, int] = {
+            normalized: max((common_prefix_length(normalized, other) for other in self.commands if other != normalized), default=0)
+            for normalized in self.commands
+        }
+        for normalized in self.commands:
+            command_trigrams = trigrams(normalized)
+            self._trigram_counts[normalized] = len(command_trigrams)
+            for trigram in command_trigrams:
+                self._index.setdefault(trigram, set()).add(normalized)
+
+    def match(self, user_request: str) -> Optional[str]:
+        if not user_request or '{' in user_request:
+            # Feedback actions arrive as JSON payloads; leave them to the model.
+            return None if user_request else NOT_FOUND
+
+        normalized = normalize_command_text(user_request)
+        if normalized in self.commands:
+            return self.commands[normalized]
+
+        words = normalized.split()
+        has_hint = not COMMAND_HINT_WORDS.isdisjoint(words)
+        if len(words) > self.MAX_COMMAND_WORDS:
+            return None if has_hint else NOT_FOUND
+
+        candidate, similarity = self.most_similar(normalized)
+        if candidate is not None:
+            distance = edit_distance(normalized, candidate)
+            if distance <= max(1, int(len(candidate) * self.TYPO_MAX_DISTANCE_RATIO)):
+                if self.is_unambiguous_typo(normalized, candidate):
+                    return self.commands[candidate]
+                return None
+        if has_hint or similarity >= self.AMBIGUOUS_SIMILARITY:
+            return None
+        return NOT_FOUND
+
+    def is_unambiguous_typo(self, normalized: str, candidate: str) -> bool:
+        """Whether the typos in ``normalized`` leave the suffix that tells ``candidate`` apart intact."""
+        shared = self._shared_prefix[candidate]
+        prefix, suffix = candidate[:shared], candidate[shared:]
+        # Split the request where it best lines up with the prefix and the suffix of the command.
+        best = None
+        for split in range(len(normalized) + 1):
+            tail_distance = edit_distance(normalized[split:], suffix)
+            key = (edit_distance(normalized[:split], prefix) + tail_distance, tail_distance)
+            if best is None or key < best[0]:
+                best = (key, normalized[split:])
+        (_, suffix_distance), tail = best
+        if suffix_distance == 0:
+            return True
+        if suffix_distance > int(len(suffix) * self.TYPO_MAX_DISTANCE_RATIO):
+            return False
+        siblings = [other[shared:] for other in self.commands if other != candidate and other[:shared] == prefix]
+        return all(edit_distance(tail, sibling) > suffix_distance for sibling in siblings)
+
+    def canonical(self, text: str) -> Optional[str]:
+        """Return the declared command phrase ``text`` spells, ignoring case and punctuation."""
+        return self.commands.get(normalize_command_text(text or ""))
+
+    def is_command(self, text: str) -> bool:
+        return self.canonical(text) is not None
+
+    def most_similar(self, normalized: str):
+        """Return the command with the highest trigram Jaccard similarity and its score."""
+        request_trigrams = trigrams(normalized)
+        shared: Dict[str, int] = {}
+        for trigram in request_trigrams:
+            for command in self._index.get(trigram, ()):
+                shared[command] = shared.get(command, 0) + 1
+        best_command, best_score = None, 0.0
+        for command, count in shared.items():
+            score = count / (len(request_trigrams) + self._trigram_counts[command] - count)
+            if score > best_score:
+                best_command, best_score = command, score
+        return best_command, best_score
+
+
+def command_phrases(commands_class) -> List[str]:
+    """Collect the command phrases declared on the Commands dataclass."""
+    phrases = []
+    for name, value in vars(commands_class).items():
+        if name.startswith('_'):
+            continue
+        if isinstance(value, str):
+            phrases.append(value)
+        elif isinstance(value, dict):
+            phrases.extend(value.keys())
+    return phrases
@@ -7,6 +7,8 @@ from contextlib import asynccontextmanager
 import asyncio
 from Config.configuration import AppConfig
 from common.openai_utils import OpenAIUtility
+from common.prompt_cache import PROMPT_CACHE
+from common.command_matcher import CommandMatcher, command_phrases
 
 
 # Configure logging
@@ -56,6 +58,8 @@ class CommandMessages:
         "📝 I appreciate your feedback! Could you please let me know what specific information you were looking for or how I can improve my response?"
     )
 
+COMMAND_MATCHER = CommandMatcher(command_phrases(Commands))
+
 class CommandProcessorError(Exception):
     """Custom exception class for CommandProcessor errors."""
     pass
@@ -83,43 +87,72 @@ class CommandProcessor:
             str: Response message based on the extracted command.
         """
         try:
-            command_validation_prompt = await self._read_prompt_file()
-            command = await self._get_command_from_request(command_validation_prompt)
+            command = self.match_command_locally()
+            if command is None:
+                command_validation_prompt = await self._read_prompt_file()
+                command = await self._get_command_from_request(command_validation_prompt)
             logging.info(f'Command Processing Result :{command}')
-            if not command or command == "notfound":
-                return None
+            return await self._run_command(command)
 
-            if command in (Commands.NEW_SESSION_COMMAND, Commands.NEW_TOPIC_COMMAND):
-                self.chat_session.clear_chat_history(self.user_id)
-                return CommandMessages.NEW_TOPIC_ACTIVATED
-
-            if command == Commands.CREATE_SUPPORT_TICKET:
-                return CommandMessages.CREATE_SUPPORT_TICKET
-
-            if command == Commands.FORGET_ME_COMMAND:
-                self.chat_session.clear_chat_history(self.user_id)
-                return CommandMessages.FORGET_ME_ACTIVATED
-
-            if command == Commands.FEEDBACK_POSITIVE:
-                return CommandMessages.FEEDBACK_POSITIVE
-            
-            if command == Commands.FEEDBACK_NEGATIVE:
-                return CommandMessages.FEEDBACK_NEGATIVE
-            
-            if command in Commands.CONTEXT_COMMAND:
-                context = Commands.CONTEXT_COMMAND[command]
-                loop = asyncio.get_running_loop()
-                
-                result =await loop.run_in_executor(None, self._process_context_command, context)
+        except Exception as e:
+            logger.error(f"Error in validate_and_extract_command: {e}")
+            raise CommandProcessorError("An error occurred while processing the command. Please try again later.")
 
-                return result
+    def match_command_locally(self) -> str:
+        """Matches the user request against the commands without calling the model.
 
-            return command
+        Returns:
+            str: The command, 'notfound', or None when the request is ambiguous.
+        """
+        return COMMAND_MATCHER.match(self.user_request)
+
+    async def execute_command(self, command: str) -> str:
+        """Runs a command that was already identified, e.g. by the planner.
+
+        Args:
+            command (str): The command name.
 
+        Returns:
+            str: Response message, or None if the command is not recognised.
+        """
+        try:
+            logging.info(f'Command Processing Result :{command}')
+            if not COMMAND_MATCHER.is_command(command):
+                return None
+            return await self._run_command(command)
         except Exception as e:
-            logger.error(f"Error in validate_and_extract_command: {e}")
+            logger.error(f"Error in execute_command: {e}")
             raise CommandProcessorError("An error occurred while processing the command. Please try again later.")
 
+    async def _run_command(self, command: str) -> str:
+        if not command or command == "notfound":
+            return None
+
+        raw_command, command = command, COMMAND_MATCHER.canonical(command) or command.strip().lower()
+        if command in (Commands.NEW_SESSION_COMMAND, Commands.NEW_TOPIC_COMMAND):
+            self.chat_session.clear_chat_history(self.user_id)
+            return CommandMessages.NEW_TOPIC_ACTIVATED
+
+        if command == Commands.CREATE_SUPPORT_TICKET:
+            return CommandMessages.CREATE_SUPPORT_TICKET
+
+        if command == Commands.FORGET_ME_COMMAND:
+            self.chat_session.clear_chat_history(self.user_id)
+            return CommandMessages.FORGET_ME_ACTIVATED
+
+        if command == Commands.FEEDBACK_POSITIVE:
+            return CommandMessages.FEEDBACK_POSITIVE
+
+        if command == Commands.FEEDBACK_NEGATIVE:
+            return CommandMessages.FEEDBACK_NEGATIVE
+
+        if command in Commands.CONTEXT_COMMAND:
+            context = Commands.CONTEXT_COMMAND[command]
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._process_context_command, context)
+
+        return raw_command
+
     @asynccontextmanager
     async def _open_file(self, path: str, mode: str):
         """Asynchronous context manager for opening files."""
@@ -133,8 +166,7 @@ class CommandProcessor:
             str: Content of the command validation prompt file.
         """
         prompt_path = os.path.join(self.prompt_library_path)
-        async with self._open_file(prompt_path, 'r') as file:
-            return await file.read()
+        return await PROMPT_CACHE.read(prompt_path)
 
     async def _get_command_from_request(self, command_validation_prompt: str) -> str:
         """Gets the command from the user request using OpenAI utility.
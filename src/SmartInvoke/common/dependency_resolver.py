@@ -0,0 +1,168 @@
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from Config.configuration import AppConfig
+from .functions import parse_responsejson
+from .openai_utils import OpenAIUtility
+from .result_compactor import ResultCompactor
+from .task import Task
+from .user_action import UserAction
+
+NOT_FOUND = "not_found"
+_SCALAR_TYPES = (str, int, float, bool)
+_KEY_SEPARATORS = re.compile(r"[^0-9a-z]")
+
+
+class DependencyNotFoundError(Exception):
+    """Raised when a dependency value cannot be found in the result of its step."""
+
+    def __init__(self, dependency_param: str, dependency_step: Any):
+        super().__init__(f"Dependency {dependency_param} not found in task {dependency_step}")
+        self.dependency_param = dependency_param
+        self.dependency_step = dependency_step
+
+
+def normalize_key(key: str) -> str:
+    return _KEY_SEPARATORS.sub("", str(key).lower())
+
+
+def load_result(result: Any) -> Any:
+    """Return the agent result as parsed JSON, or None when it is not JSON."""
+    if isinstance(result, (dict, list)):
+        return result
+    if not isinstance(result, str) or ('{' not in result and '[' not in result):
+        return None
+    try:
+        return json.loads(result)
+    except ValueError:
+        return parse_responsejson(result)
+
+
+def find_by_path(data: Any, path: str) -> Any:
+    """Follow a dotted path such as ``data.employees.0.email`` through dicts and lists."""
+    current = data
+    for part in path.split('.'):
+        if isinstance(current, dict):
+            matches = [value for key, value in current.items() if normalize_key(key) == normalize_key(part)]
+            if not matches:
+                return None
+            current = matches[0]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            return None
+    return current
+
+
+def find_by_key(data: Any, key: str) -> Any:
+    """Breadth-first search for a scalar value stored under ``key`` (case and separator insensitive)."""
+    target = normalize_key(key)
+    queue = [data]
+    while queue:
+        current = queue.pop(0)
+        if isinstance(current, dict):
+            for item_key, value in current.items():
+                if normalize_key(item_key) == target and isinstance(value, _SCALAR_TYPES):
+                    return value
+            queue.extend(value for value in current.values() if isinstance(value, (dict, list)))
+        elif isinstance(current, list):
+            queue.extend(value for value in current if isinstance(value, (dict, list)))
+    return None
+
+
+class DependencyResolver:
+    """Fills a task's dependency parameters from the results of earlier steps.
+
+    Each parameter is first looked up deterministically in the JSON result of its
+    step, by the ``dependency_path`` given in the plan or by key name. Whatever is
+    left is extracted with a single structured completion for the whole task.
+    """
+
+    def __init__(self, openai_utility: OpenAIUtility, request_id: Optional[str] = None,
+                 result_compactor: Optional[ResultCompactor] = None):
+        self.openai_utility = openai_utility
+        self.request_id = request_id
+        self.result_compactor = result_compactor
+
+    @staticmethod
+    def expand_dependencies(task: Task) -> List[Tuple[str, Any]]:
+        """Flatten dependencies whose parameter is a list of names."""
+        expanded = []
+        for dependency_param, dependency_step in task.dependencies:
+            params = dependency_param if isinstance(dependency_param, list) else [dependency_param]
+            expanded.extend((param, dependency_step) for param in params)
+        return expanded
+
+    async def resolve(self, task: Task, completed_tasks: Dict[Any, Any]) -> Union[Task, UserAction]:
+        if not task.dependencies:
+            return task
+
+        unresolved: List[Tuple[str, Any]] = []
+        for dependency_param, dependency_step in self.expand_dependencies(task):
+            if dependency_step not in completed_tasks:
+                continue
+            value = self.extract_value(completed_tasks[dependency_step], dependency_param, task.dependency_paths.get(dependency_param))
+            if value is None:
+                unresolved.append((dependency_param, dependency_step))
+            else:
+                task.agent_payload[dependency_param] = value
+
+        if not unresolved:
+            return task
+        logging.info(f"Resolving {len(unresolved)} dependencies of step {task.step} with the model")
+        try:
+            values = await self.extract_with_model(unresolved, completed_tasks)
+            for dependency_param, dependency_step in unresolved:
+                value = values.get(dependency_param)
+                if value is None or value == NOT_FOUND:
+                    raise DependencyNotFoundError(dependency_param, dependency_step)
+                task.agent_payload[dependency_param] = value
+        except DependencyNotFoundError as e:
+            logging.error(f"Error resolving dependencies for task {task.step}: {e}")
+            return UserAction(ActionType="UserMessage", Message=completed_tasks[e.dependency_step])
+        except Exception as e:
+            logging.error(f"Error resolving dependencies for task {task.step}: {e}", exc_info=True)
+            return UserAction(ActionType="UserMessage", Message=completed_tasks[unresolved[0][1]])
+        return task
+
+    @staticmethod
+    def extract_value(result: Any, dependency_param: str, dependency_path: Optional[str] = None) -> Any:
+        data = load_result(result)
+        if data is None:
+            return None
+        value = find_by_path(data, dependency_path) if dependency_path else None
+        if value is None:
+            value = find_by_key(data, dependency_param)
+        return value if isinstance(value, _SCALAR_TYPES) else None
+
+    async def extract_with_model(self, unresolved: List[Tuple[str, Any]], completed_tasks: Dict[Any, Any]) -> Dict[str, Any]:
+        """Extract all unresolved parameters of a task with one JSON-mode completion."""
+        params = [dependency_param for dependency_param, _ in unresolved]
+        steps = list(dict.fromkeys(dependency_step for _, dependency_step in unresolved))
+        prompt = (
+            f"Your task is to identify the values of the parameters {', '.join(params)} from the below provided content. "
+            f"Return only a JSON object whose keys are exactly these parameter names and whose values are the identified values. "
+            f"If you can't find the value of a parameter, set its value to '{NOT_FOUND}'."
+        )
+        app_config = AppConfig.get_instance()
+        results = {step: completed_tasks[step] for step in steps}
+        if self.result_compactor:
+            token_budget = app_config.DEPENDENCY_RESOLUTION_TOKEN_BUDGET // len(steps)
+            # No field pruning: the model is only asked because the keys did not match the parameters.
+            results = {step: self.result_compactor.compact(result, token_budget, "dependency_resolution")
+                       for step, result in results.items()}
+        content = "\n\n".join(f"### Step {step} result:\n{result}" for step, result in results.items())
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": content}
+        ]
+        result = await self.openai_utility.generate_completion_json_format(
+            prompt=messages, gpt_deployment_name=app_config.GPT_DEPLOYMENT_NAME, conversation_id=self.request_id,
+            ai_assistant=app_config.MODULE_NAME, request_id=self.request_id
+        )
+        values = parse_responsejson(result)
+        if not isinstance(values, dict):
+            raise ValueError(f"Unexpected dependency extraction result: {result}")
+        return values
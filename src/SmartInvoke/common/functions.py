@@ -1,16 +1,17 @@
 from datetime import datetime, timezone
-import json
 import os
 import logging
 import timeit
 import hashlib
 import inspect
-import tiktoken
 import requests
 import re
 import aiohttp
 
 from azure.identity import ClientSecretCredential
+from common import tokenizer
+from common.json_extractor import JSONExtractionError, extract_json
+from common.tracing import TRACER, SPAN_KIND_CLIENT
 
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
@@ -53,80 +54,15 @@ def generate_cache_key(user_id, user_query, is_permission_check_enabled):
 
 def split_text_by_token(text: str, max_tokens: int, chunk_overlap: int) -> list:  
     """Split a text into chunks of a maximum number of tokens with a specified overlap."""
-    if max_tokens <= 0:  
-        raise ValueError("max_tokens must be greater than 0")  
-    if chunk_overlap < 0:  
-        raise ValueError("chunk_overlap must be non-negative")  
-    if chunk_overlap >= max_tokens:  
-        raise ValueError("chunk_overlap must be less than max_tokens")  
-
-    tokenizer = tiktoken.encoding_for_model("gpt-4-0314")  
-    tokens = tokenizer.encode(text)  
-
-    if not tokens:  
-        return []  
-
-    chunks = []  
-    start = 0  
-    while start < len(tokens):  
-        end = start + max_tokens  
-        chunk = tokens[start:end]  
-        chunks.append(chunk)  
-        start += max_tokens - chunk_overlap  
-
-    text_chunks = [tokenizer.decode(chunk) for chunk in chunks]  
-    return text_chunks 
+    return tokenizer.split_text_by_token(text, max_tokens, chunk_overlap)
 
 def count_tokens_str(messages, model="gpt-3.5-turbo-0613")->int:
-    """Return the number of tokens used by a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(messages))
-    except KeyError:
-        logging.info("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(messages))
-        
+    """Return the number of tokens used by a string."""
+    return tokenizer.count_text_tokens(messages, model)
+
 def count_tokens(messages, model="gpt-3.5-turbo-0613"):
     """Return the number of tokens used by a list of messages."""
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        logging.info("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model in {
-        "gpt-3.5-turbo-0613",
-        "gpt-3.5-turbo-1106",
-        "gpt-3.5-turbo-16k-0613",
-        "gpt-4-0314",
-        "gpt-4-32k-0314",
-        "gpt-4-0613",
-        "gpt-4-32k-0613",
-        }:
-        tokens_per_message = 3
-        tokens_per_name = 1
-    elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = 4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        tokens_per_name = -1  # if there's a name, the role is omitted
-    elif "gpt-3.5-turbo" in model:
-        
-        return count_tokens(messages, model="gpt-3.5-turbo-0613")
-    elif "gpt-4" in model:
-        
-        return count_tokens(messages, model="gpt-4-0613")
-    else:
-        raise NotImplementedError(
-            f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
-        )
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.items():
-            num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += tokens_per_name
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+    return tokenizer.count_message_tokens(messages, model)
 
 def get_arm_access_token(tenant_id, client_id, client_secret) -> str:
     credential = ClientSecretCredential(tenant_id, client_id, client_secret)
@@ -189,46 +125,31 @@ async def async_get(url: str, params: dict = None) -> dict:
                 raise Exception(f"Failed to get response from service. : {response.reason}")
             return await response.json()
 
-async def async_get_service_response(url:str,data:str, access_token=None)-> str:
+async def async_get_service_response(url:str,data:str, access_token=None, transport=None)-> str:
     if access_token is not None:
        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {access_token}'}
     else:
         headers = {'Content-Type': 'application/json'} 
+    if transport is not None:
+        return await _get_service_response(transport.session, url, headers, data)
     async with aiohttp.ClientSession() as session:
+        return await _get_service_response(session, url, headers, data)
+
+async def _get_service_response(session, url, headers, data) -> str:
+    with TRACER.start_span("GET", {"http.request.method": "GET", "url.full": url}, kind=SPAN_KIND_CLIENT) as span:
         async with session.get(url, headers=headers,  data=data) as response:
+            span.set_attribute("http.response.status_code", response.status)
             if response.status != 200 and response.status != 201 and response.status != 500:
                 raise Exception(f"Failed to get response from service. : {response.reason}")
             return await response.text()
 
 def parse_responsejson(result):
-        try:
-            # Remove the leading 'json\n' if present
-            result = result.replace('json\n', '')
-
-            # Find the start and end indices of the JSON object
-            json_start_index = result.find('{')
-            json_end_index = result.rfind('}')  # Using rfind to ensure we get the last closing brace
-
-            # Extract and trim the JSON object from the result
-            json_string = result[json_start_index:json_end_index + 1].strip()
-
-            response_body = json.loads(json_string)
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON decode error: {str(e)}")
-            
-            # Attempt to fix the string by replacing backslashes
-            fixed_result = result.replace('\\', '\\\\')
-
-            try:
-                response_body = json.loads(fixed_result)
-            except json.JSONDecodeError as e:
-                logging.error(f"Failed to parse fixed JSON string: {str(e)}")
-                response_body = None
-        except Exception as e:
-            logging.error(f"Unexpected error: {str(e)}")
-            response_body = None
-
-        return response_body
+    """Extract the JSON object from an LLM or agent response, or return None."""
+    try:
+        return extract_json(result)
+    except JSONExtractionError as e:
+        logging.error(f"JSON decode error: {str(e)}")
+        return None
 
 
 def convert_to_utc_iso(dt: datetime) -> str:
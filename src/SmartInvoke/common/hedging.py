@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_BUDGET_RATIO = 0.1
+DEFAULT_BUDGET_BURST = 10
+
+
+class LatencyTracker:
+    """Sliding window of recent call durations, in seconds."""
+
+    def __init__(self, window: int = 100):
+        self.samples = deque(maxlen=window)
+
+    def record(self, duration: float) -> None:
+        self.samples.append(duration)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+class HedgingBudget:
+    """Caps hedged requests at ``ratio`` of all calls.
+
+    Every call earns ``ratio`` of a token and every hedge spends one, with at
+    most ``burst`` tokens saved up, so a slow agent cannot double the load on
+    the agent services.
+    """
+
+    _shared: Optional['HedgingBudget'] = None
+
+    def __init__(self, ratio: float = DEFAULT_BUDGET_RATIO, burst: int = DEFAULT_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 1.0
+
+    @classmethod
+    def shared(cls, ratio: float = DEFAULT_BUDGET_RATIO) -> 'HedgingBudget':
+        """The process-wide budget shared by every agent."""
+        if cls._shared is None:
+            cls._shared = cls(ratio)
+        return cls._shared
+
+    def record_call(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Hedger:
+    """Sends a second identical request when a call runs past the observed p95.
+
+    Configured per agent in agent_config.json; only enable it for read-only agents::
+
+        "hedging": {"enabled": true, "percentile": 95, "min_delay_ms": 200, "max_delay_ms": 5000,
+                    "initial_delay_ms": 1000, "min_samples": 20}
+
+    Until ``min_samples`` durations have been seen the hedge fires after
+    ``initial_delay_ms``. The first successful response wins and the other
+    request is cancelled.
+    """
+
+    def __init__(self, name: str, config: Optional[Dict[str, Any]], budget: HedgingBudget):
+        config = config or {}
+        self.name = name
+        self.enabled = bool(config.get('enabled', False))
+        self.percentile = float(config.get('percentile', 95))
+        self.min_delay = float(config.get('min_delay_ms', 200)) / 1000
+        self.max_delay = float(config.get('max_delay_ms', 5000)) / 1000
+        self.initial_delay = float(config.get('initial_delay_ms', 1000)) / 1000
+        self.min_samples = int(config.get('min_samples', 20))
+        self.budget = budget
+        self.latency = LatencyTracker()
+
+    def hedge_delay(self) -> float:
+        observed = self.latency.percentile(self.percentile) if len(self.latency.samples) >= self.min_samples else None
+        delay = observed if observed is not None else self.initial_delay
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    async def _timed(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        result = await call()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await call()
+        self.budget.record_call()
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(call))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done or not self.budget.try_acquire():
+                return await primary
+            logging.info(f"Hedging slow call to agent {self.name}")
+            pending.add(asyncio.ensure_future(self._timed(call)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary and primary in pending:
+                            # The primary that lost took at least this long; leaving it out
+                            # would only keep the fast calls and pull the hedge delay down.
+                            self.latency.record(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
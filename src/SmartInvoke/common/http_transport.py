@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+
+class HttpTransport:
+    """Process-wide aiohttp session for calls to the agent services.
+
+    Connections are pooled with a per-host limit and kept alive between
+    requests, and DNS lookups are cached, so repeated agent calls skip the
+    TCP and TLS handshakes. The session is created lazily inside the running
+    event loop and recreated if it was closed or the loop changed.
+    """
+
+    def __init__(self, limit_per_host: int = 20, connect_timeout: float = 5, read_timeout: float = 60,
+                 keepalive_timeout: float = 60, dns_cache_ttl: int = 300):
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_app_config(cls, app_config) -> 'HttpTransport':
+        return cls(
+            limit_per_host=app_config.HTTP_CONNECTION_LIMIT_PER_HOST,
+            connect_timeout=app_config.HTTP_CONNECT_TIMEOUT,
+            read_timeout=app_config.HTTP_READ_TIMEOUT,
+            keepalive_timeout=app_config.HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=app_config.HTTP_DNS_CACHE_TTL
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl
+            )
+            timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._loop = loop
+            logging.info("HTTP transport session created")
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logging.info("HTTP transport session closed")
+        self._session = None
+        self._loop = None
+
+    def close_at_exit(self) -> None:
+        """Close the session from an atexit hook, on the loop it was created in.
+
+        The Functions host stops the worker's loop before the interpreter exits;
+        when the loop is already closed there is nothing to run the close on and
+        the sockets are released with the process.
+        """
+        loop = self._loop
+        if self._session is None or self._session.closed or loop is None or loop.is_closed() or loop.is_running():
+            return
+        try:
+            loop.run_until_complete(self.close())
+        except Exception as e:
+            logging.warning(f"Error closing the HTTP transport at exit: {e}")
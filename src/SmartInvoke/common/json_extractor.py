@@ -0,0 +1,143 @@
+import json
+import re
+from typing import Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Runs of text that need no attention: anything but quotes, braces and stray control
+# characters, and complete strings that are already valid JSON.
+_VALID_STRING = r'"[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"'
+# Written as unrolled loops so a string that needs repair fails the match without backtracking.
+_PLAIN = re.compile(r'[^"{}\x00-\x08\x0b\x0c\x0e-\x1f]*(?:' + _VALID_STRING + r'[^"{}\x00-\x08\x0b\x0c\x0e-\x1f]*)*')
+# Inside a string that needs repair only the closing quote, escapes and raw control characters matter.
+_STRING = re.compile(r'["\\\x00-\x1f]')
+_HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+
+class JSONExtractionError(ValueError):
+    """Raised when no JSON object can be extracted from a text."""
+
+
+def loads(text: str) -> Any:
+    """Parse JSON with orjson when it is installed, falling back to the standard library."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson is stricter, e.g. about NaN and integers beyond 64 bits.
+            pass
+    return json.loads(text)
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` fence, as LLMs often wrap their JSON in one."""
+    text = text.strip()
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline >= 0 else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def scan_object(text: str, start: int) -> Tuple[str, bool]:
+    """Return the JSON object opening at ``start`` and whether it had to be repaired.
+
+    The text is scanned once, skipping valid strings and plain text in a single
+    regex match and walking character by character only through strings that
+    need repair. Invalid
+    escapes get their backslash escaped, an escaped single quote becomes a plain
+    one, raw control characters in strings are escaped and those between values
+    are dropped. Text after the closing brace of the object is ignored.
+    """
+    parts = []
+    copied = start
+    depth = 0
+    pos = start
+    in_string = False
+    while True:
+        if not in_string:
+            pos = _PLAIN.match(text, pos).end()
+            if pos >= len(text):
+                raise JSONExtractionError("Unterminated JSON object")
+            index = pos
+        else:
+            match = _STRING.search(text, pos)
+            if match is None:
+                raise JSONExtractionError("Unterminated JSON object")
+            index = match.start()
+        char = text[index]
+        pos = index + 1
+        if in_string:
+            if char == '"':
+                in_string = False
+            elif char == "\\":
+                escaped = text[pos:pos + 1]
+                if escaped in _VALID_ESCAPES and (escaped != "u" or _HEX4.fullmatch(text, pos + 1, pos + 5)):
+                    pos += 1
+                elif escaped == "'":
+                    parts += [text[copied:index], "'"]
+                    copied = pos = index + 2
+                else:
+                    parts += [text[copied:index], "\\\\"]
+                    copied = pos
+            else:
+                parts += [text[copied:index], _CONTROL_ESCAPES.get(char, f"\\u{ord(char):04x}")]
+                copied = pos
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                break
+        else:
+            parts.append(text[copied:index])
+            copied = pos
+    if not parts:
+        return text[start:pos], False
+    parts.append(text[copied:pos])
+    return "".join(parts), True
+
+
+def extract_json(text: Any, embedded: bool = True) -> Any:
+    """Extract the outermost JSON object from an LLM or agent response.
+
+    The text between the first opening and the last closing brace is parsed
+    directly, which covers clean JSON, fenced or not. Anything else is scanned
+    for the first complete object, which is repaired on the way and then parsed.
+    With ``embedded`` False the response itself has to start with the object,
+    so prose that happens to contain braces is not mistaken for JSON.
+    """
+    if isinstance(text, (bytes, bytearray)):
+        text = text.decode("utf-8", errors="replace")
+    if not isinstance(text, str):
+        raise JSONExtractionError(f"Expected a string, got {type(text).__name__}")
+    text = strip_code_fences(text)
+    start = text.find("{") if embedded else (0 if text.startswith("{") else -1)
+    if start < 0:
+        raise JSONExtractionError("No JSON object found")
+    end = text.rfind("}") + 1
+    try:
+        return loads(text[start:end])
+    except ValueError:
+        pass
+    candidate, _ = scan_object(text, start)
+    try:
+        return loads(candidate)
+    except ValueError as e:
+        raise JSONExtractionError(f"Invalid JSON object: {e}") from e
+
+
+def try_extract_json(text: Any, embedded: bool = True) -> Optional[Any]:
+    """Like extract_json, but returns None when no object can be extracted."""
+    try:
+        return extract_json(text, embedded)
+    except JSONExtractionError:
+        return None
@@ -0,0 +1,161 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+DEFAULT_MAX_FIELD_CHARS = 1000
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def truncate_value(value: Any, max_chars: int) -> Any:
+    """Cap a field at ``max_chars`` characters, noting how much was cut."""
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if max_chars <= 0 or len(text) <= max_chars:
+        return value
+    return f"{text[:max_chars]}...[{len(text) - max_chars} chars truncated]"
+
+
+class StructuredMessage:
+    """A log message with key/value fields, rendered only when a handler formats it."""
+
+    def __init__(self, message: str, fields: Dict[str, Any]):
+        self.message = message
+        self.fields = fields
+
+    def __str__(self) -> str:
+        pairs = " ".join(f"{key}={self.render(value)}" for key, value in self.fields.items())
+        return f"{self.message} {pairs}" if pairs else self.message
+
+    @staticmethod
+    def render(value: Any) -> str:
+        if isinstance(value, str) and value and not any(char.isspace() or char in '="' for char in value):
+            return value
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def parse_sample_rates(setting: Optional[str]) -> Dict[str, float]:
+    """Parse a LOG_SAMPLE_RATES setting such as ``agent_response=0.1,llm=0.5``."""
+    rates = {}
+    for item in (setting or "").split(","):
+        category, _, rate = item.partition("=")
+        if category.strip() and rate.strip():
+            try:
+                rates[category.strip()] = min(1.0, max(0.0, float(rate)))
+            except ValueError:
+                logging.warning(f"Ignoring invalid log sample rate: {item}")
+    return rates
+
+
+class StructuredLogger:
+    """Logs key/value records by category, with size caps and per-category sampling.
+
+    Every string field is cut to ``max_field_chars``. A category with a sample
+    rate of 0.1 keeps one record in ten; warnings and errors are never sampled.
+    """
+
+    def __init__(self, name: str = "smartinvoke", max_field_chars: int = DEFAULT_MAX_FIELD_CHARS,
+                 sample_rates: Optional[Dict[str, float]] = None):
+        self.logger = logging.getLogger(name)
+        self.max_field_chars = max_field_chars
+        self.sample_rates = dict(sample_rates or {})
+
+    def configure(self, max_field_chars: Optional[int] = None, sample_rates: Optional[Dict[str, float]] = None) -> None:
+        if max_field_chars is not None:
+            self.max_field_chars = max_field_chars
+        if sample_rates is not None:
+            self.sample_rates = dict(sample_rates)
+
+    def is_sampled(self, category: str, level: int) -> bool:
+        rate = self.sample_rates.get(category, 1.0)
+        return level >= logging.WARNING or rate >= 1.0 or random.random() < rate
+
+    def log(self, category: str, message: str, level: int = logging.INFO, **fields: Any) -> None:
+        if not self.logger.isEnabledFor(level) or not self.is_sampled(category, level):
+            return
+        fields = {key: truncate_value(value, self.max_field_chars) for key, value in fields.items()}
+        self.logger.log(level, StructuredMessage(message, {"category": category, **fields}),
+                        extra={"category": category, "fields": fields})
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records without formatting them, so formatting happens on the listener thread.
+
+    Records are dropped with a warning count when the queue is full rather than
+    blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Moves the root logger's handlers behind a queue served by a background thread.
+
+    Records that are emitted from the listener thread are no longer tied to a
+    function invocation, so the pipeline is opt-in through LOG_PIPELINE_ENABLED.
+    """
+
+    _lock = threading.Lock()
+    _listener: Optional[QueueListener] = None
+    _handler: Optional[DeferredQueueHandler] = None
+
+    @classmethod
+    def start(cls, queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        with cls._lock:
+            if cls._listener is not None:
+                return
+            root = logging.getLogger()
+            handlers = [handler for handler in root.handlers if not isinstance(handler, DeferredQueueHandler)]
+            if not handlers:
+                return
+            log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+            cls._handler = DeferredQueueHandler(log_queue)
+            cls._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            for handler in handlers:
+                root.removeHandler(handler)
+            root.addHandler(cls._handler)
+            cls._listener.start()
+            atexit.register(cls.stop)
+
+    @classmethod
+    def stop(cls) -> None:
+        """Flush the queue and give the handlers back to the root logger."""
+        with cls._lock:
+            if cls._listener is None:
+                return
+            cls._listener.stop()
+            root = logging.getLogger()
+            root.removeHandler(cls._handler)
+            for handler in cls._listener.handlers:
+                root.addHandler(handler)
+            if cls._handler.dropped:
+                logging.warning(f"Log pipeline dropped {cls._handler.dropped} records")
+            cls._listener = None
+            cls._handler = None
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls._listener is not None
+
+
+STRUCTURED_LOG = StructuredLogger()
+
+
+def log_event(category: str, message: str, level: int = logging.INFO, **fields: Any) -> None:
+    STRUCTURED_LOG.log(category, message, level, **fields)
@@ -0,0 +1,182 @@
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .tracing import SPAN_KIND_CLIENT
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._label_values(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; quantiles are estimated by linear interpolation inside a bucket."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per bucket counts, then the +Inf bucket, the sum and the total count.
+            series = self.series.setdefault(key, [0] * (len(self.buckets) + 3))
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def quantile(self, q: float, **labels: str) -> Optional[float]:
+        series = self.series.get(self._label_values(labels))
+        if not series or not series[-1]:
+            return None
+        rank = q * series[-1]
+        cumulative = 0
+        for index, upper in enumerate(self.buckets):
+            if cumulative + series[index] >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (upper - lower) * (rank - cumulative) / series[index]
+            cumulative += series[index]
+        return self.buckets[-1]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = [(key, list(values)) for key, values in self.series.items()]
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for index, upper in enumerate(self.buckets + (float("inf"),)):
+                cumulative += values[index]
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', _format_number(upper)))} {_format_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {_format_number(values[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics registry rendered in the Prometheus text format.
+
+    Every Functions worker process keeps its own registry, so the scraper has
+    to aggregate across instances.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, *args, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, documentation: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, label_names)
+
+    def histogram(self, name: str, documentation: str, label_names: Iterable[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, label_names, buckets)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "smartinvoke_request_duration_seconds", "Duration of Invoker requests.", ["status"])
+STAGE_DURATION = REGISTRY.histogram(
+    "smartinvoke_stage_duration_seconds", "Duration of request stages, taken from the trace spans.", ["stage"])
+AGENT_DURATION = REGISTRY.histogram(
+    "smartinvoke_agent_duration_seconds", "Duration of agent calls.", ["agent"])
+AGENT_CALLS = REGISTRY.counter(
+    "smartinvoke_agent_calls_total", "Agent calls by outcome.", ["agent", "outcome"])
+LLM_DURATION = REGISTRY.histogram(
+    "smartinvoke_llm_duration_seconds", "Duration of chat completion requests.", ["deployment"])
+LLM_TOKENS = REGISTRY.counter(
+    "smartinvoke_llm_tokens_total", "Tokens used by chat completions.", ["deployment", "type"])
+CACHE_REQUESTS = REGISTRY.counter(
+    "smartinvoke_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+RETRIES = REGISTRY.counter(
+    "smartinvoke_retries_total", "Retried calls by operation.", ["operation"])
+CIRCUIT_OPEN = REGISTRY.counter(
+    "smartinvoke_circuit_open_total", "Calls rejected by an open circuit breaker.", ["agent"])
+PLANNER_OUTPUTS = REGISTRY.counter(
+    "smartinvoke_planner_outputs_total", "Planner completions by validation result (valid, repaired or invalid).", ["result"])
+
+
+def record_stage_duration(span) -> None:
+    """Tracer span listener; client spans are covered by the agent and LLM metrics."""
+    if span.kind != SPAN_KIND_CLIENT:
+        STAGE_DURATION.observe(span.duration, stage=span.name)
+
+
+def record_retry(operation: str):
+    """tenacity ``before_sleep`` callback counting retries of ``operation``."""
+    def before_sleep(retry_state) -> None:
+        RETRIES.inc(operation=operation)
+    return before_sleep
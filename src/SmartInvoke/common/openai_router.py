@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 4.0
+LOW_QUOTA_TOKENS = 2000
+LOW_QUOTA_PENALTY = 4.0
+THROTTLE_COOLDOWN = 1.0
+FAILURE_COOLDOWN = 5.0
+
+
+@dataclass
+class EndpointTarget:
+    """One endpoint/deployment pair serving a logical deployment name."""
+    endpoint: str
+    deployment: str
+    client: Any
+    client_sync: Any = None
+    latency: float = 0.0
+    error_rate: float = 0.0
+    remaining_tokens: Optional[float] = None
+    cooldown_until: float = 0.0
+    calls: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.endpoint}/{self.deployment}"
+
+    def score(self) -> float:
+        """Lower is better; targets not tried yet score 0 so every target gets measured."""
+        score = self.latency * (1 + ERROR_PENALTY * self.error_rate)
+        if self.remaining_tokens is not None and self.remaining_tokens < LOW_QUOTA_TOKENS:
+            score *= LOW_QUOTA_PENALTY
+        return score
+
+
+def _ewma(current: float, sample: float, calls: int) -> float:
+    return sample if calls == 0 else (1 - EWMA_ALPHA) * current + EWMA_ALPHA * sample
+
+
+def _is_failover_error(error: Exception) -> bool:
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def _retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    for name, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(name)) / scale
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class OpenAIRouter:
+    """Routes OpenAI calls for a logical deployment name over several endpoints.
+
+    Configured with a JSON list, usually from the ``OPENAI_ENDPOINTS`` setting::
+
+        [{"name": "eastus", "api_base": "https://...", "api_key": "", "api_version": "2024-04-01-preview",
+          "deployments": {"gpt-4o": "gpt-4o-eastus"}}]
+
+    Each call goes to the target with the lowest EWMA latency, weighted by its
+    recent error rate and remaining token quota. On 429, 5xx, timeout or
+    connection errors the target is put on cooldown and the call fails over to
+    the next target; the error is raised only when every target failed.
+    """
+
+    def __init__(self, targets: Dict[str, List[EndpointTarget]]):
+        self.targets = targets
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, endpoints: Optional[str], client_factory: Callable[[str, str, str], Any],
+                    sync_client_factory: Callable[[str, str, str], Any], default_api_version: str) -> Optional['OpenAIRouter']:
+        """Build the router from the endpoints JSON, or return None when no endpoints are configured."""
+        if not endpoints:
+            return None
+        targets: Dict[str, List[EndpointTarget]] = {}
+        for endpoint in json.loads(endpoints):
+            api_version = endpoint.get("api_version") or default_api_version
+            client = client_factory(endpoint["api_base"], endpoint.get("api_key"), api_version)
+            client_sync = sync_client_factory(endpoint["api_base"], endpoint.get("api_key"), api_version)
+            for model, deployment in endpoint.get("deployments", {}).items():
+                targets.setdefault(model, []).append(
+                    EndpointTarget(endpoint.get("name", endpoint["api_base"]), deployment, client, client_sync)
+                )
+        logging.info(f"OpenAI router configured for {sorted(targets)}")
+        return cls(targets)
+
+    def has_targets(self, model: str) -> bool:
+        return bool(self.targets.get(model))
+
+    def ranked_targets(self, model: str) -> List[EndpointTarget]:
+        """Targets for ``model``, best first; targets on cooldown go last."""
+        now = time.monotonic()
+        return sorted(self.targets.get(model, []), key=lambda target: (target.cooldown_until > now, target.score()))
+
+    def record_success(self, target: EndpointTarget, duration: float, headers=None) -> None:
+        with self._lock:
+            target.latency = _ewma(target.latency, duration, target.calls)
+            target.error_rate = _ewma(target.error_rate, 0.0, target.calls)
+            target.calls += 1
+            if headers:
+                try:
+                    target.remaining_tokens = float(headers.get("x-ratelimit-remaining-tokens"))
+                except (TypeError, ValueError):
+                    pass
+
+    def record_failure(self, target: EndpointTarget, error: Exception, duration: float) -> None:
+        """Count the failure and the time it took, so a target that times out does not look fast.
+
+        A failure never lowers the latency estimate, however quickly it came back.
+        """
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        is_throttled = isinstance(error, APIStatusError) and error.status_code == 429
+        cooldown = _retry_after(headers) or (THROTTLE_COOLDOWN if is_throttled else FAILURE_COOLDOWN)
+        with self._lock:
+            target.latency = _ewma(target.latency, max(duration, target.latency), target.calls)
+            target.error_rate = _ewma(target.error_rate, 1.0, target.calls)
+            target.calls += 1
+            target.cooldown_until = max(target.cooldown_until, time.monotonic() + cooldown)
+        logging.warning(f"OpenAI target {target.name} failed ({error.__class__.__name__}), cooling down {cooldown:.1f}s")
+
+    async def route(self, model: str, send: Callable[[EndpointTarget], Awaitable[Any]]) -> Any:
+        """Call ``send`` with the best target for ``model``, failing over to the others."""
+        last_error: Optional[Exception] = None
+        for target in self.ranked_targets(model):
+            start = time.monotonic()
+            try:
+                response = await send(target)
+            except Exception as e:
+                if not _is_failover_error(e):
+                    raise
+                self.record_failure(target, e, time.monotonic() - start)
+                last_error = e
+                continue
+            self.record_success(target, time.monotonic() - start, getattr(response, "headers", None))
+            return response
+        raise last_error
+
+    def route_sync(self, model: str, send: Callable[[EndpointTarget], Any]) -> Any:
+        """Blocking variant of ``route`` for the synchronous client."""
+        last_error: Optional[Exception] = None
+        for target in self.ranked_targets(model):
+            start = time.monotonic()
+            try:
+                response = send(target)
+            except Exception as e:
+                if not _is_failover_error(e):
+                    raise
+                self.record_failure(target, e, time.monotonic() - start)
+                last_error = e
+                continue
+            self.record_success(target, time.monotonic() - start, getattr(response, "headers", None))
+            return response
+        raise last_error
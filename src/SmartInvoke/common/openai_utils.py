@@ -1,16 +1,30 @@
 from datetime import datetime, timezone
+import hashlib
+import json
 import os
 from typing import Optional
-from tabulate import tabulate
 from pydantic import BaseModel, Field
 from common.constants import LLMModelConfiguration
 from tenacity import RetryError, retry, retry_if_exception_type, stop_after_attempt, wait_exponential, wait_random_exponential
 import logging
 from openai import APIConnectionError, AsyncAzureOpenAI, AzureOpenAI, RateLimitError, APITimeoutError, APIConnectionError
 from prompt_library.prompts import QUERY_SUGGESTION_PROMPT
+from common.rate_limiter import RateLimiterRegistry, estimate_prompt_tokens
+from common.openai_router import OpenAIRouter
+from common.cache_utils import TieredCache
+from common.singleflight import SingleFlight
+from common.tracing import TRACER, SPAN_KIND_CLIENT
+from common.metrics import CACHE_REQUESTS, LLM_DURATION, LLM_TOKENS, record_retry
+from common.log_pipeline import log_event
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 
 
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+# Azure OpenAI rejects stream_options and json_schema response formats on older API versions.
+STREAM_USAGE_MIN_API_VERSION = "2024-09-01"
+JSON_SCHEMA_MIN_API_VERSION = "2024-08-01"
+
+
 class OpenAIUtility():
     DEFAULT_TEMPERATURE = 0
     DEFAULT_MAX_TOKENS = 1024
@@ -36,7 +50,12 @@ class OpenAIUtility():
                     cosmos_endpoint: Optional[str] = None,
                     cosmos_key: Optional[str] = None,
                     cosmos_database_name: Optional[str] = None,
-                    cosmos_container_name: Optional[str] = None
+                    cosmos_container_name: Optional[str] = None,
+                    requests_per_minute: Optional[int] = None,
+                    tokens_per_minute: Optional[int] = None,
+                    openai_endpoints: Optional[str] = None,
+                    completion_cache: Optional[TieredCache] = None,
+                    completion_cache_ttl: Optional[int] = None
     ):
         self.openai_api_base = openai_api_base or os.getenv('OPENAI_API_BASE')
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
@@ -45,8 +64,19 @@ class OpenAIUtility():
         self.cosmos_key = cosmos_key or os.getenv('COSMOS_KEY', "")
         self.cosmos_database_name = cosmos_database_name or os.getenv('COSMOS_DATABASE_NAME', "")
         self.cosmos_container_name = cosmos_container_name or os.getenv('COSMOS_CONTAINER_NAME', "")
+        self.requests_per_minute = int(requests_per_minute or os.getenv('OPENAI_RPM_LIMIT', 0))
+        self.tokens_per_minute = int(tokens_per_minute or os.getenv('OPENAI_TPM_LIMIT', 0))
         self.openai_client = self.initialize_openai_client(openai_api_base, openai_api_key, openai_api_version)
         self.openai_client_sync = self.initialize_openai_client_sync(openai_api_base, openai_api_key, openai_api_version)
+        self.completion_cache = completion_cache
+        self.completion_cache_ttl = completion_cache_ttl
+        self.completion_cache_hits = 0
+        self.completion_cache_misses = 0
+        self.inflight = SingleFlight("completion")
+        self.router = OpenAIRouter.from_config(
+            openai_endpoints or os.getenv('OPENAI_ENDPOINTS'), self.initialize_openai_client,
+            self.initialize_openai_client_sync, default_api_version=openai_api_version
+        )
         
 
     def initialize_openai_client(self,openai_api_base,openai_api_key,openai_api_version):
@@ -82,80 +112,225 @@ class OpenAIUtility():
     @retry(  
         wait=wait_exponential(multiplier=1, min=2, max=4),  
         stop=stop_after_attempt(2),  
-        retry=retry_if_exception_type((RateLimitError, APITimeoutError, APIConnectionError))  
+        retry=retry_if_exception_type((RateLimitError, APITimeoutError, APIConnectionError)),
+        before_sleep=record_retry("openai")
     )
-    async def generate_completion(self, prompt, gpt_deployment_name=DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, ai_assistant="", conversation_id="", request_id=None):
+    async def generate_completion(self, prompt, gpt_deployment_name=DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, ai_assistant="", conversation_id="", request_id=None, use_cache=True):
+        return await self.complete(prompt, gpt_deployment_name, max_token, None, use_cache)
+    
+    async def generate_completion_json_format(self, prompt, gpt_deployment_name=DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, ai_assistant="", conversation_id="", request_id=None, use_cache=True, response_format=None):
+        return await self.complete(prompt, gpt_deployment_name, max_token, response_format or JSON_RESPONSE_FORMAT, use_cache)
+
+    @property
+    def supports_json_schema(self):
+        return (self.openai_api_version or "") >= JSON_SCHEMA_MIN_API_VERSION
+
+    async def stream_completion_json_format(self, prompt, gpt_deployment_name=DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, response_format=None):
+        """Stream a JSON mode completion, yielding the content as it is generated.
+
+        Streamed completions bypass the completion cache. Token usage is only
+        requested from API versions that support ``stream_options``.
+        """
+        with TRACER.start_span(f"chat {gpt_deployment_name}", {"gen_ai.system": "az.ai.openai", "gen_ai.request.model": gpt_deployment_name,
+                                                               "gen_ai.request.max_tokens": max_token, "gen_ai.request.stream": True},
+                               kind=SPAN_KIND_CLIENT) as span:
+            start_time = datetime.now()
+            request_options = {"stream_options": {"include_usage": True}} if (self.openai_api_version or "") >= STREAM_USAGE_MIN_API_VERSION else {}
+            stream = await self.create_chat_completion(
+                model=gpt_deployment_name,
+                messages=prompt,
+                temperature=self.DEFAULT_TEMPERATURE,
+                max_tokens=max_token,
+                top_p=self.DEFAULT_TOP_P,
+                response_format=response_format or JSON_RESPONSE_FORMAT,
+                stream=True,
+                **request_options
+            )
+            usage_chunk = None
+            async for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage_chunk = chunk
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if "gen_ai.response.time_to_first_chunk" not in span.attributes:
+                        span.set_attribute("gen_ai.response.time_to_first_chunk", (datetime.now() - start_time).total_seconds())
+                    yield chunk.choices[0].delta.content
+            duration = datetime.now() - start_time
+            if usage_chunk is not None:
+                self.log_completion(usage_chunk, duration)
+            self.record_usage(usage_chunk, gpt_deployment_name, duration.total_seconds())
+
+    async def complete(self, prompt, gpt_deployment_name, max_token, response_format, use_cache):
+        """Serve a completion from the cache, or share one request between identical concurrent callers."""
+        with TRACER.start_span(f"chat {gpt_deployment_name}", {"gen_ai.system": "az.ai.openai", "gen_ai.request.model": gpt_deployment_name,
+                                                               "gen_ai.request.max_tokens": max_token}, kind=SPAN_KIND_CLIENT) as span:
+            if not use_cache:
+                return await self.request_completion(prompt, gpt_deployment_name, max_token, response_format)
+            cache_key = self.get_completion_cache_key(gpt_deployment_name, prompt, max_token, response_format)
+            cached_result = await self.read_completion_cache(cache_key, gpt_deployment_name)
+            if cached_result is not None:
+                span.set_attribute("completion.cache", "hit")
+                return cached_result
+            return await self.inflight.do(
+                cache_key, lambda: self.request_completion(prompt, gpt_deployment_name, max_token, response_format, cache_key)
+            )
+
+    async def request_completion(self, prompt, gpt_deployment_name, max_token, response_format=None, cache_key=None):
+        request_options = {"response_format": response_format} if response_format else {}
         start_time = datetime.now() 
-        response = await self.openai_client.chat.completions.create(
+        response = await self.create_chat_completion(
             model=gpt_deployment_name,
             messages=prompt,
             temperature=self.DEFAULT_TEMPERATURE,
             max_tokens=max_token,
-            top_p=self.DEFAULT_TOP_P
+            top_p=self.DEFAULT_TOP_P,
+            **request_options
         )
         end_time =  datetime.now()
         duration = end_time - start_time
 
-        log_message = self.generate_log_message(response, duration)  
-            
-                
-        logging.info(f'\n{log_message}\n')
+        self.log_completion(response, duration, cache_status="miss" if cache_key else None)
+        self.record_usage(response, gpt_deployment_name, duration.total_seconds())
         result = response.choices[0].message.content
+        await self.write_completion_cache(cache_key, result)
         return result
-    
-    async def generate_completion_json_format(self, prompt, gpt_deployment_name=DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, ai_assistant="", conversation_id="", request_id=None):
-        start_time = datetime.now() 
-        response = await self.openai_client.chat.completions.create(
-            model=gpt_deployment_name,
-            messages=prompt,
-            response_format={ "type": "json_object" },
-            temperature=self.DEFAULT_TEMPERATURE,
-            max_tokens=max_token,
-            top_p=self.DEFAULT_TOP_P
-        )
-        end_time =  datetime.now()
-        duration = end_time - start_time
 
-        log_message = self.generate_log_message(response, duration)  
-            
-                
-        logging.info(f'\n{log_message}\n')
-        result = response.choices[0].message.content
+    @staticmethod
+    def record_usage(response, gpt_deployment_name, duration):
+        """Record the duration and token usage of a response in the metrics and the current trace span."""
+        LLM_DURATION.observe(duration, deployment=gpt_deployment_name)
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) if details else None
+        LLM_TOKENS.inc(usage.prompt_tokens, deployment=gpt_deployment_name, type="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens, deployment=gpt_deployment_name, type="completion")
+        if cached_tokens:
+            LLM_TOKENS.inc(cached_tokens, deployment=gpt_deployment_name, type="cached")
+        span = TRACER.current_span
+        if span is None:
+            return
+        span.set_attributes({
+            "gen_ai.response.model": getattr(response, "model", None),
+            "gen_ai.usage.input_tokens": usage.prompt_tokens,
+            "gen_ai.usage.output_tokens": usage.completion_tokens,
+            "gen_ai.usage.cached_tokens": cached_tokens
+        })
+
+    async def create_chat_completion(self, **kwargs):
+        """Create a chat completion, routed over the configured endpoints when a router is set up."""
+        model = kwargs["model"]
+        if self.router is None or not self.router.has_targets(model):
+            raw_response = await self.send_chat_completion(self.openai_client, model, kwargs)
+        else:
+            raw_response = await self.router.route(model, lambda target: self.send_chat_completion(
+                target.client, target.name, {**kwargs, "model": target.deployment}
+            ))
+        return raw_response.parse()
+
+    async def send_chat_completion(self, client, limiter_key, kwargs):
+        """Send one chat completion, queued behind the target's shared rate limiter when limits are set."""
+        limiter = RateLimiterRegistry.get(limiter_key, self.requests_per_minute, self.tokens_per_minute)
+        if limiter is not None:
+            await limiter.acquire(estimate_prompt_tokens(kwargs["messages"]) + kwargs.get("max_tokens", 0))
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            if limiter is not None:
+                limiter.throttled(e.response.headers if e.response is not None else None)
+            raise
+        if limiter is not None:
+            limiter.update_from_headers(raw_response.headers)
+        return raw_response
+
+    def create_chat_completion_sync(self, **kwargs):
+        model = kwargs["model"]
+        if self.router is None or not self.router.has_targets(model):
+            return self.openai_client_sync.chat.completions.create(**kwargs)
+        raw_response = self.router.route_sync(model, lambda target: target.client_sync.chat.completions.with_raw_response.create(
+            **{**kwargs, "model": target.deployment}
+        ))
+        return raw_response.parse()
+
+    async def create_embeddings(self, texts, model_name):
+        with TRACER.start_span(f"embeddings {model_name}", {"gen_ai.system": "az.ai.openai", "gen_ai.request.model": model_name},
+                               kind=SPAN_KIND_CLIENT):
+            if self.router is None or not self.router.has_targets(model_name):
+                return await self.openai_client.embeddings.create(input=texts, model=model_name)
+            raw_response = await self.router.route(model_name, lambda target: target.client.embeddings.with_raw_response.create(
+                input=texts, model=target.deployment
+            ))
+            return raw_response.parse()
+
+    def create_embeddings_sync(self, texts, model_name):
+        if self.router is None or not self.router.has_targets(model_name):
+            return self.openai_client_sync.embeddings.create(input=texts, model=model_name)
+        raw_response = self.router.route_sync(model_name, lambda target: target.client_sync.embeddings.with_raw_response.create(
+            input=texts, model=target.deployment
+        ))
+        return raw_response.parse()
+
+    def get_completion_cache_key(self, gpt_deployment_name, prompt, max_token, response_format=None):
+        payload = json.dumps([gpt_deployment_name, prompt, max_token, response_format], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def read_completion_cache(self, cache_key, gpt_deployment_name):
+        if self.completion_cache is None or cache_key is None:
+            return None
+        start_time = datetime.now()
+        result = await self.completion_cache.get(cache_key)
+        if result is None:
+            self.completion_cache_misses += 1
+            CACHE_REQUESTS.inc(cache="completion", result="miss")
+            return None
+        self.completion_cache_hits += 1
+        CACHE_REQUESTS.inc(cache="completion", result="hit")
+        log_event("llm", "Completion cache hit", model=gpt_deployment_name, completion_cache=self.completion_cache_status("hit"),
+                  duration_sec=(datetime.now() - start_time).total_seconds())
         return result
 
-    def generate_log_message(self, response, duration):
+    async def write_completion_cache(self, cache_key, result):
+        if self.completion_cache is None or cache_key is None or not result:
+            return
+        await self.completion_cache.set(cache_key, result, self.completion_cache_ttl)
+
+    def completion_cache_status(self, status):
+        return f"{status} (hits: {self.completion_cache_hits}, misses: {self.completion_cache_misses})"
+
+    def log_completion(self, response, duration, cache_status=None):
         try:
-            
-            model = response.model
-            prompt_tokens = response.usage.prompt_tokens
-            completion_tokens = response.usage.completion_tokens
-            if response.usage.prompt_tokens_details:
-                cache_tokens = response.usage.prompt_tokens_details.cached_tokens
-            else:
-                cache_tokens = 0
-            total_tokens = response.usage.total_tokens
-            duration_sec = duration.total_seconds()
-            data = [  
-                    ["Model", model],  
-                    ["Prompt Tokens Used", prompt_tokens],  
-                    ["Completion Tokens Generated", completion_tokens],
-                    ["cache_tokens", cache_tokens],
-                    ["total_tokens", total_tokens],
-                    ["Duration (Sec)", duration_sec]
-                ]  
-                
-                # Generate the tabular message  
-            log_message = tabulate(data, tablefmt="grid")
-            return log_message
+            usage = response.usage
+            cache_tokens = (usage.prompt_tokens_details.cached_tokens if usage.prompt_tokens_details else 0) or 0
+            fields = {
+                "model": response.model,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "cache_tokens": cache_tokens,
+                "cached_prompt_pct": round(100 * cache_tokens / usage.prompt_tokens, 1) if usage.prompt_tokens else 0.0,
+                "total_tokens": usage.total_tokens,
+                "duration_sec": duration.total_seconds()
+            }
+            if cache_status and self.completion_cache is not None:
+                fields["completion_cache"] = self.completion_cache_status(cache_status)
+            log_event("llm", "Chat completion", **fields)
         except Exception as e:
-            logging.error(f'Error in generate_log_message: {e}')
-            return ""
-            
+            logging.error(f'Error in log_completion: {e}')
 
     @retry(wait=wait_exponential(multiplier=1, min=2, max=4), stop=stop_after_attempt(2))
-    def generate_completion_sync(self, prompt, gpt_deployment_name= DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS):
+    def generate_completion_sync(self, prompt, gpt_deployment_name= DEFAULT_MODEL_NAME, max_token=DEFAULT_MAX_TOKENS, use_cache=True):
+        # Only the in-process tier is used here; the Redis tier is reached through the async API.
+        cache_key = self.get_completion_cache_key(gpt_deployment_name, prompt, max_token) if use_cache and self.completion_cache is not None else None
+        if cache_key:
+            cached_result = self.completion_cache.get_local(cache_key)
+            if cached_result is not None:
+                self.completion_cache_hits += 1
+                CACHE_REQUESTS.inc(cache="completion", result="hit")
+                logging.info(f"Completion cache {self.completion_cache_status('hit')}")
+                return cached_result
+            self.completion_cache_misses += 1
+            CACHE_REQUESTS.inc(cache="completion", result="miss")
         start_time=datetime.now()
-        response = self.openai_client_sync.chat.completions.create(
+        response = self.create_chat_completion_sync(
             model=gpt_deployment_name,
             messages=prompt,
             temperature=self.DEFAULT_TEMPERATURE,
@@ -164,9 +339,10 @@ class OpenAIUtility():
         )
         end_time =  datetime.now()
         duration = end_time - start_time
-        log_message = self.generate_log_message(response, duration)
-        logging.info(log_message)
+        self.log_completion(response, duration, cache_status="miss" if cache_key else None)
         result = response.choices[0].message.content
+        if cache_key and result:
+            self.completion_cache.set_local(cache_key, result, self.completion_cache_ttl)
         return result
 
     @retry(wait=wait_exponential(multiplier=1, min=2, max=4), stop=stop_after_attempt(2))
@@ -265,11 +441,15 @@ class OpenAIUtility():
         return iso_format
     
     def generate_embeddings(self, text, model_name=DEFAULT_EMBEDDING_MODEL):
-        return self.openai_client_sync.embeddings.create(
-            input=text, model=model_name).data[0].embedding
+        return self.create_embeddings_sync(text, model_name).data[0].embedding
     
     @retry(wait=wait_random_exponential(min=1, max=20), stop=stop_after_attempt(3))
     async def generate_embeddings_async(self, text, model_name=DEFAULT_EMBEDDING_MODEL):
-        response = await self.openai_client.embeddings.create(input=text, model=model_name)
+        response = await self.create_embeddings(text, model_name)
         embeddings = response.data[0].embedding
-        return embeddings
\ No newline at end of file
+        return embeddings
+
+    @retry(wait=wait_random_exponential(min=1, max=20), stop=stop_after_attempt(3))
+    async def generate_embeddings_batch_async(self, texts, model_name=DEFAULT_EMBEDDING_MODEL):
+        response = await self.create_embeddings(texts, model_name)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from .cache_utils import TieredCache
+from .functions import generate_cache_key
+
+DEFAULT_PLAN_TTL = 900
+CACHEABLE_ACTION_TYPES = ("Execute", "UserMessage", "ClarificationNeeded")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Casefold the query, drop punctuation and collapse whitespace."""
+    query = _PUNCTUATION.sub(" ", query.casefold())
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+@lru_cache(maxsize=8)
+def hash_prompt(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class PlanCache:
+    """Caches planner decisions (the parsed planner JSON) per user and normalized query.
+
+    Configured by the ``plan`` entry of the agent_config ``cache`` section::
+
+        "cache": {"plan": {"enabled": true, "ttl": 900, "max_entries": 512}}
+
+    Only the planner output is cached; the per-request payload fields are added
+    again when the plan is rebuilt from a hit.
+    """
+
+    def __init__(self, plan_cache_config: Optional[Dict[str, Any]], store: TieredCache):
+        plan_cache_config = plan_cache_config or {}
+        self.enabled = bool(plan_cache_config.get('enabled', False))
+        self.ttl = int(plan_cache_config.get('ttl', DEFAULT_PLAN_TTL))
+        self.store = store
+
+    def build_key(self, query: str, planner_prompt: str, config_version: Optional[str], config_last_updated: Optional[str],
+                  current_date: str, user_id: Optional[str] = None) -> str:
+        """Build the cache key; ``user_id`` scopes it to the user whose id is in the planner prompt."""
+        user_query = "|".join([
+            normalize_query(query), hash_prompt(planner_prompt), str(config_version), str(config_last_updated), current_date
+        ])
+        return generate_cache_key(user_id=user_id, user_query=user_query, is_permission_check_enabled=user_id is not None)
+
+    async def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        cached_plan = await self.store.get(cache_key)
+        if not cached_plan:
+            return None
+        try:
+            return json.loads(cached_plan)
+        except ValueError:
+            logging.warning("Discarding unreadable cached plan")
+            return None
+
+    async def set(self, cache_key: str, json_data: Dict[str, Any]) -> None:
+        if not isinstance(json_data, dict) or json_data.get("ActionType") not in CACHEABLE_ACTION_TYPES:
+            return
+        await self.store.set(cache_key, json.dumps(json_data), self.ttl)
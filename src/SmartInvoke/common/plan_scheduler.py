@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from .plan import Plan
+from .task import Task
+
+DEFAULT_MAX_CONCURRENCY = 4
+# Stands in for a dependency on a step that is not in the plan, or not yet;
+# a task waiting for it is never started.
+_MISSING_STEP = -1
+
+
+class PlanHalted(Exception):
+    """Raised by a task executor to stop the plan early and return a value to the caller."""
+
+    def __init__(self, value: Any):
+        super().__init__("Plan execution halted")
+        self.value = value
+
+
+class PlanScheduler:
+    """Runs the tasks of a plan as a dependency graph.
+
+    Every task whose dependencies have completed is started immediately, up to
+    ``max_concurrency`` tasks at a time. If a task fails (or halts the plan), all
+    tasks still running are cancelled and the exception is propagated.
+
+    A task that depends on an unknown step, or on steps that in turn depend on
+    it, can never become ready and is skipped, as is everything downstream of
+    it; the rest of the plan still runs.
+
+    Tasks can also arrive while the plan runs, from the ``task_source`` passed to
+    ``run``. Until the source is exhausted, a task that depends on a step not seen
+    yet waits for it; unknown steps and cycles are only reported once it is.
+    """
+
+    def __init__(self, plan: Plan, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.tasks: List[Task] = list(plan)
+        self.max_concurrency = max(1, max_concurrency or DEFAULT_MAX_CONCURRENCY)
+        self._upstream: Dict[int, Set[int]] = self._build_graph()
+
+    def _build_graph(self, complete: bool = True) -> Dict[int, Set[int]]:
+        """Map each task index to the indexes of the tasks it waits for.
+
+        With ``complete`` False more tasks may still be added to the plan.
+        """
+        indexes_by_step: Dict[Any, List[int]] = {}
+        for index, task in enumerate(self.tasks):
+            indexes_by_step.setdefault(task.step, []).append(index)
+
+        upstream: Dict[int, Set[int]] = {}
+        for index, task in enumerate(self.tasks):
+            upstream[index] = set()
+            for _, dependency_step in task.dependencies:
+                if dependency_step not in indexes_by_step:
+                    if complete:
+                        logging.warning(f"Step {task.step} depends on unknown step {dependency_step}")
+                    upstream[index].add(_MISSING_STEP)
+                    continue
+                upstream[index].update(i for i in indexes_by_step[dependency_step] if i != index)
+        if complete:
+            self._report_blocked_tasks(upstream)
+        return upstream
+
+    def _report_blocked_tasks(self, upstream: Dict[int, Set[int]]) -> None:
+        """Log the tasks that wait on each other or on a missing step and so will not run."""
+        remaining = {index: set(deps) for index, deps in upstream.items()}
+        ready = [index for index, deps in remaining.items() if not deps]
+        while ready:
+            for index in ready:
+                del remaining[index]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            ready = [index for index, deps in remaining.items() if not deps]
+        if remaining:
+            steps = sorted({str(self.tasks[index].step) for index in remaining})
+            logging.warning(f"Skipping steps {', '.join(steps)}: they wait on a missing step or on each other")
+
+    async def run(self, execute: Callable[[Task], Awaitable[Any]],
+                  task_source: Optional[AsyncIterator[Task]] = None) -> List[Task]:
+        """Execute all tasks, including those from ``task_source``, and return them in completion order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        completed: Set[int] = set()
+        started: Set[int] = set()
+        running: Dict[asyncio.Future, int] = {}
+        finished: List[Task] = []
+
+        async def run_task(task: Task) -> Any:
+            async with semaphore:
+                return await execute(task)
+
+        async def next_task() -> Task:
+            return await task_source.__anext__()
+
+        arriving: Optional[asyncio.Future] = None
+        if task_source is not None:
+            self._upstream = self._build_graph(complete=False)
+            arriving = asyncio.ensure_future(next_task())
+
+        def start_ready_tasks() -> None:
+            for index, task in enumerate(self.tasks):
+                if index not in started and self._upstream[index] <= completed:
+                    started.add(index)
+                    running[asyncio.ensure_future(run_task(task))] = index
+
+        start_ready_tasks()
+        try:
+            while running or arriving:
+                waiting = list(running.keys()) + ([arriving] if arriving else [])
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future is arriving:
+                        try:
+                            self.tasks.append(future.result())
+                        except StopAsyncIteration:
+                            arriving = None
+                            self._upstream = self._build_graph()
+                        else:
+                            arriving = asyncio.ensure_future(next_task())
+                            self._upstream = self._build_graph(complete=False)
+                        continue
+                    index = running.pop(future)
+                    future.result()
+                    completed.add(index)
+                    finished.append(self.tasks[index])
+                start_ready_tasks()
+        finally:
+            await self._cancel(list(running.keys()) + ([arriving] if arriving else []))
+        return finished
+
+    @staticmethod
+    async def _cancel(futures) -> None:
+        pending = [future for future in futures if not future.done()]
+        for future in pending:
+            future.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
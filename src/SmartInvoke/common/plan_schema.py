@@ -0,0 +1,295 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .json_extractor import JSONExtractionError, extract_json
+
+EXECUTE_ACTION_TYPE = "Execute"
+MESSAGE_ACTION_TYPES = ("UserMessage", "ClarificationNeeded")
+COMMAND_ACTION_TYPE = "Command"
+
+RESULT_VALID = "valid"
+RESULT_REPAIRED = "repaired"
+RESULT_INVALID = "invalid"
+
+_STEP_KEYS = {"step": "Step", "agentname": "Agent name", "agentpayload": "Agent payload",
+              "statusmessage": "Status Message", "dependency": "dependency", "dependencies": "dependency"}
+_DEPENDENCY_KEYS = {"dependencyparameter": "dependency_parameter", "dependencystep": "dependency_step",
+                    "dependencypath": "dependency_path"}
+_KEY_SEPARATORS = re.compile(r"[^0-9a-z]")
+_TOKENS = re.compile(r'''
+    (?P<string>"(?:[^"\\]|\\.)*(?P<closed>")?)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<open>[{\[])
+  | (?P<close>[}\]])
+  | (?P<comma>,)
+  | (?P<colon>:)
+  | (?P<literal>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null)
+  | (?P<space>\s+)
+  | (?P<other>.)
+''', re.VERBOSE | re.DOTALL)
+
+
+def plan_response_format(agent_names: Iterable[str]) -> Dict[str, Any]:
+    """JSON schema response format for the planner output.
+
+    Agent payloads differ per agent, so the schema cannot be strict; the model
+    is guided by it and the output is still validated by ``repair_plan``.
+    """
+    dependency = {
+        "type": "object",
+        "properties": {
+            "dependency_parameter": {"anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}]},
+            "dependency_step": {"type": "integer"},
+            "dependency_path": {"type": "string"}
+        },
+        "required": ["dependency_parameter", "dependency_step"]
+    }
+    step = {
+        "type": "object",
+        "properties": {
+            "Step": {"type": "integer"},
+            "Agent name": {"type": "string", "enum": sorted(agent_names)},
+            "Status Message": {"type": "string"},
+            "Agent payload": {"type": "object"},
+            "dependency": {"type": "array", "items": dependency}
+        },
+        "required": ["Step", "Agent name", "Status Message", "Agent payload"]
+    }
+    schema = {
+        "type": "object",
+        "properties": {
+            "ActionType": {"type": "string", "enum": [EXECUTE_ACTION_TYPE, *MESSAGE_ACTION_TYPES, COMMAND_ACTION_TYPE]},
+            "ExecutePlan": {"type": "array", "items": step},
+            "Message": {"type": "string"},
+            "Command": {"type": "string"}
+        },
+        "required": ["ActionType"]
+    }
+    return {"type": "json_schema", "json_schema": {"name": "execution_plan", "strict": False, "schema": schema}}
+
+
+def repair_json_text(text: str) -> Tuple[str, bool]:
+    """Fix the syntax errors planners make, in one pass over the tokens.
+
+    Drops comments and trailing commas and adds missing commas between values.
+    Strings, arrays and objects left open are closed, and the second value
+    returned tells whether the completion was cut off like that.
+    """
+    output: List[str] = []
+    stack: List[str] = []
+    after_value = False
+    pending_comma = False
+    last = ""
+    for match in _TOKENS.finditer(text):
+        if last and not stack:
+            # Whatever follows the outermost value is not part of the plan.
+            break
+        kind = match.lastgroup
+        token = match.group()
+        if kind in ("comment", "space"):
+            if kind == "space":
+                output.append(token)
+            continue
+        if kind == "comma":
+            pending_comma = pending_comma or after_value
+            after_value = False
+            continue
+        if kind == "close":
+            pending_comma = False
+            if stack:
+                output.append("}" if stack.pop() == "{" else "]")
+            after_value = True
+            last = kind
+            continue
+        starts_value = kind in ("string", "literal", "open")
+        if pending_comma or (starts_value and after_value and stack):
+            output.append(",")
+        pending_comma = False
+        if kind == "string" and match.group("closed") is None:
+            token += '"'
+        output.append(token)
+        if kind == "open":
+            stack.append(token)
+        after_value = kind in ("string", "literal")
+        last = kind
+    truncated = bool(stack)
+    if last == "colon":
+        output.append("null")
+    output.extend("}" if bracket == "{" else "]" for bracket in reversed(stack))
+    return "".join(output), truncated
+
+
+def normalize_key(key: Any) -> str:
+    return _KEY_SEPARATORS.sub("", str(key).lower())
+
+
+def _canonical_keys(item: Dict[str, Any], names: Dict[str, str], repairs: List[str], where: str) -> Dict[str, Any]:
+    canonical = {}
+    for key, value in item.items():
+        name = names.get(normalize_key(key), key)
+        if name != key:
+            repairs.append(f"{where}: renamed {key!r} to {name!r}")
+        canonical.setdefault(name, value)
+    return canonical
+
+
+def _as_int(value: Any) -> Any:
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def normalize_step(item: Any, position: int, agent_names: Iterable[str] = ()) -> Tuple[Dict[str, Any], List[str]]:
+    """Bring one ExecutePlan step into the shape build_task expects; raises ValueError when it cannot."""
+    where = f"step {position}"
+    if not isinstance(item, dict):
+        raise ValueError(f"{where} is not an object")
+    repairs: List[str] = []
+    step = _canonical_keys(item, _STEP_KEYS, repairs, where)
+
+    if "Step" not in step:
+        step["Step"] = position
+        repairs.append(f"{where}: added missing Step")
+    elif _as_int(step["Step"]) != step["Step"]:
+        step["Step"] = _as_int(step["Step"])
+        repairs.append(f"{where}: converted Step to a number")
+
+    agent_name = step.get("Agent name")
+    if not isinstance(agent_name, str) or not agent_name:
+        raise ValueError(f"{where} has no agent name")
+    known = {name.lower(): name for name in agent_names}
+    if known and agent_name not in known.values() and agent_name.lower() in known:
+        step["Agent name"] = known[agent_name.lower()]
+        repairs.append(f"{where}: corrected agent name {agent_name!r}")
+
+    payload = step.get("Agent payload")
+    if isinstance(payload, str):
+        try:
+            payload = extract_json(payload)
+            repairs.append(f"{where}: parsed Agent payload from a string")
+        except JSONExtractionError:
+            payload = None
+    if not isinstance(payload, dict):
+        if "Agent payload" in step:
+            repairs.append(f"{where}: replaced invalid Agent payload")
+        else:
+            repairs.append(f"{where}: added missing Agent payload")
+        payload = {}
+    step["Agent payload"] = payload
+
+    if not isinstance(step.get("Status Message"), str):
+        step["Status Message"] = "" if step.get("Status Message") is None else str(step["Status Message"])
+        repairs.append(f"{where}: fixed Status Message")
+
+    dependencies = step.get("dependency", [])
+    if isinstance(dependencies, dict):
+        dependencies = [dependencies]
+        repairs.append(f"{where}: wrapped dependency in a list")
+    elif not isinstance(dependencies, list):
+        dependencies = []
+        repairs.append(f"{where}: dropped invalid dependency")
+    valid_dependencies = []
+    for dependency in dependencies:
+        if not isinstance(dependency, dict):
+            repairs.append(f"{where}: dropped invalid dependency")
+            continue
+        dependency = _canonical_keys(dependency, _DEPENDENCY_KEYS, repairs, where)
+        if not dependency.get("dependency_parameter") or dependency.get("dependency_step") is None:
+            repairs.append(f"{where}: dropped incomplete dependency")
+            continue
+        if _as_int(dependency["dependency_step"]) != dependency["dependency_step"]:
+            dependency["dependency_step"] = _as_int(dependency["dependency_step"])
+            repairs.append(f"{where}: converted dependency_step to a number")
+        valid_dependencies.append(dependency)
+    if valid_dependencies or "dependency" in step:
+        step["dependency"] = valid_dependencies
+    return step, repairs
+
+
+def normalize_plan(data: Any, agent_names: Iterable[str] = ()) -> Tuple[Dict[str, Any], List[str]]:
+    """Validate the planner output and coerce it to the expected shape; raises ValueError when it cannot."""
+    if not isinstance(data, dict):
+        raise ValueError("Planner output is not a JSON object")
+    repairs: List[str] = []
+    action_type = data.get("ActionType")
+    if not isinstance(action_type, str) or not action_type:
+        if "ExecutePlan" in data:
+            action_type = EXECUTE_ACTION_TYPE
+        elif "Command" in data:
+            action_type = COMMAND_ACTION_TYPE
+        elif "Message" in data:
+            action_type = "UserMessage"
+        else:
+            raise ValueError("Planner output has no ActionType")
+        repairs.append(f"inferred ActionType {action_type}")
+
+    if action_type == EXECUTE_ACTION_TYPE:
+        steps = data.get("ExecutePlan", [])
+        if isinstance(steps, dict):
+            steps = [steps]
+            repairs.append("wrapped ExecutePlan in a list")
+        if not isinstance(steps, list):
+            raise ValueError("ExecutePlan is not a list")
+        plan_steps = []
+        agent_names = list(agent_names)
+        for position, item in enumerate(steps, start=1):
+            step, step_repairs = normalize_step(item, position, agent_names)
+            plan_steps.append(step)
+            repairs.extend(step_repairs)
+        return {**data, "ActionType": action_type, "ExecutePlan": plan_steps}, repairs
+
+    if action_type in MESSAGE_ACTION_TYPES:
+        message = data.get("Message", data.get("UserMessage"))
+        if not isinstance(message, str):
+            raise ValueError(f"{action_type} output has no Message")
+        if "Message" not in data:
+            repairs.append("used UserMessage as Message")
+        extra = sorted(key for key in data if key not in ("ActionType", "Message"))
+        if extra:
+            repairs.append(f"dropped {', '.join(extra)}")
+        return {"ActionType": action_type, "Message": message}, repairs
+
+    if action_type == COMMAND_ACTION_TYPE and not isinstance(data.get("Command"), str):
+        raise ValueError("Command output has no Command")
+    return {**data, "ActionType": action_type}, repairs
+
+
+@dataclass
+class PlanRepairResult:
+    data: Optional[Dict[str, Any]]
+    result: str
+    repairs: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def repair_plan(text: str, agent_names: Iterable[str] = ()) -> PlanRepairResult:
+    """Parse and validate the planner output, repairing it locally when it is malformed.
+
+    ``result`` is "valid" when the output was usable as is, "repaired" when it
+    had to be fixed and "invalid" when it could not be used.
+    """
+    repairs: List[str] = []
+    try:
+        data = extract_json(text)
+    except JSONExtractionError:
+        start = text.find("{") if isinstance(text, str) else -1
+        if start < 0:
+            return PlanRepairResult(None, RESULT_INVALID, error="No JSON object found")
+        repaired_text, truncated = repair_json_text(text[start:])
+        if truncated:
+            # A plan that was cut off may be missing steps, so it is not executed.
+            return PlanRepairResult(None, RESULT_INVALID, error="Planner output is truncated")
+        try:
+            data = extract_json(repaired_text)
+        except JSONExtractionError as e:
+            return PlanRepairResult(None, RESULT_INVALID, error=str(e))
+        repairs.append("fixed JSON syntax")
+    try:
+        data, shape_repairs = normalize_plan(data, agent_names)
+    except ValueError as e:
+        return PlanRepairResult(None, RESULT_INVALID, repairs, str(e))
+    repairs.extend(shape_repairs)
+    return PlanRepairResult(data, RESULT_REPAIRED if repairs else RESULT_VALID, repairs)
@@ -0,0 +1,214 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .json_extractor import JSONExtractionError, extract_json, loads
+from .plan import Plan, PlanError
+from .plan_schema import repair_json_text
+from .task import Task
+
+PLAN_KEY = "ExecutePlan"
+ACTION_TYPE_KEY = "ActionType"
+EXECUTE_ACTION_TYPE = "Execute"
+_END = object()
+
+
+def _parse_json(literal: str) -> Any:
+    """Parse a JSON object, fixing the syntax errors planners make; raises JSONExtractionError."""
+    try:
+        return extract_json(literal)
+    except JSONExtractionError:
+        start = literal.find("{")
+        if start < 0:
+            raise
+        repaired, truncated = repair_json_text(literal[start:])
+        if truncated:
+            raise JSONExtractionError("Planner output is truncated")
+        return extract_json(repaired)
+
+
+class PlanStreamParser:
+    """Incremental parser for the planner's JSON output.
+
+    Fed the completion chunk by chunk, it reports the top-level ActionType as soon
+    as its value is complete and every object of the ExecutePlan array as soon as
+    its closing brace arrives. ``finish`` parses the whole completion and returns
+    the items an incremental parse could not produce. Comments, trailing and
+    missing commas are repaired the same way ``plan_schema.repair_plan`` does.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.action_type: Optional[str] = None
+        self.data: Optional[Dict[str, Any]] = None
+        self.items_emitted = 0
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._after_colon = False
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._plan_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._failed = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Add a chunk of the completion and return the plan items it completed."""
+        self.text += chunk
+        items = []
+        text = self.text
+        for index in range(self._pos, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._read_top_level_string(text[self._string_start:index + 1])
+            elif char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if char == "[" and len(self._stack) == 1 and self._after_colon and self._key == PLAN_KEY:
+                    self._plan_depth = 2
+                elif char == "{" and self._plan_depth is not None and len(self._stack) == self._plan_depth:
+                    self._item_start = index
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._item_start is not None and len(self._stack) == self._plan_depth:
+                    item = self._parse_item(text[self._item_start:index + 1])
+                    self._item_start = None
+                    if item is not None:
+                        items.append(item)
+                elif self._plan_depth is not None and len(self._stack) < self._plan_depth:
+                    self._plan_depth = None
+            elif len(self._stack) == 1:
+                if char == ":":
+                    self._after_colon = True
+                    self._key = self._last_string
+                elif char == ",":
+                    self._after_colon = False
+        self._pos = len(text)
+        return items
+
+    def _read_top_level_string(self, literal: str) -> None:
+        try:
+            value = loads(literal)
+        except ValueError:
+            value = literal[1:-1]
+        if not self._after_colon:
+            self._last_string = value
+        elif self._key == ACTION_TYPE_KEY and self.action_type is None:
+            self.action_type = value
+
+    def _parse_item(self, literal: str) -> Optional[Dict[str, Any]]:
+        # Once an item is skipped, later items are left to finish so the plan keeps its order.
+        if self._failed:
+            return None
+        try:
+            item = _parse_json(literal)
+        except JSONExtractionError as e:
+            logging.warning(f"Could not parse plan step while streaming, waiting for the full plan: {e}")
+            self._failed = True
+            return None
+        self.items_emitted += 1
+        return item
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """Parse the complete output and return the plan items not emitted yet."""
+        try:
+            self.data = _parse_json(self.text)
+        except JSONExtractionError as e:
+            if self.items_emitted or self.action_type == EXECUTE_ACTION_TYPE:
+                raise PlanError(f"Planner returned an invalid plan after {self.items_emitted} steps: {e}") from e
+            return []
+        if self.action_type is None and isinstance(self.data, dict):
+            self.action_type = self.data.get(ACTION_TYPE_KEY)
+        items = self.data.get(PLAN_KEY, []) if isinstance(self.data, dict) else []
+        return list(items[self.items_emitted:]) if isinstance(items, list) else []
+
+
+class PlanStream:
+    """A plan whose tasks are built while the planner is still writing it.
+
+    The completion is read by a task of its own, so the scheduler can start the
+    steps that are already known while later steps are still being generated.
+    Iterating the stream yields each task once, after adding it to ``plan``.
+    """
+
+    def __init__(self, chunks: AsyncIterator[str], build_task: Callable[[Dict[str, Any]], Task],
+                 on_complete: Optional[Callable[[str, Any], Awaitable[None]]] = None):
+        self.plan = Plan()
+        self.parser = PlanStreamParser()
+        self._chunks = chunks
+        self._build_task = build_task
+        self._on_complete = on_complete
+        self._items: asyncio.Queue = asyncio.Queue()
+        self._action_type_read = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self) -> None:
+        try:
+            async for chunk in self._chunks:
+                for item in self.parser.feed(chunk):
+                    self._items.put_nowait(item)
+                if self.parser.action_type is not None:
+                    self._action_type_read.set()
+            try:
+                for item in self.parser.finish():
+                    self._items.put_nowait(item)
+            finally:
+                # Also called when the output is invalid, with None for the data.
+                if self._on_complete is not None:
+                    try:
+                        await self._on_complete(self.parser.text, self.parser.data)
+                    except Exception as e:
+                        logging.error(f"Error completing streamed plan: {e}")
+        except Exception as e:
+            self._error = e
+        finally:
+            self._items.put_nowait(_END)
+            self._action_type_read.set()
+
+    async def action_type(self) -> Optional[str]:
+        """Wait until the planner has written its ActionType, or has finished without one."""
+        await self._action_type_read.wait()
+        if self.parser.action_type is None and self._error is not None:
+            raise self._error
+        return self.parser.action_type
+
+    async def read_all(self) -> str:
+        """Wait for the complete planner output."""
+        await asyncio.shield(self._reader)
+        if self._error is not None:
+            raise self._error
+        return self.parser.text
+
+    async def close(self) -> None:
+        """Stop reading the completion, e.g. when the plan was halted before the planner finished."""
+        if not self._reader.done():
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+    def __aiter__(self) -> 'PlanStream':
+        return self
+
+    async def __anext__(self) -> Task:
+        item = await self._items.get()
+        if item is _END:
+            # Leave the marker for anyone else waiting on the stream.
+            self._items.put_nowait(_END)
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        task = self._build_task(item)
+        self.plan.add_task(task)
+        return task
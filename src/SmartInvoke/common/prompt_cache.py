@@ -0,0 +1,35 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+
+FileFingerprint = Optional[Tuple[int, int]]
+
+
+def get_file_fingerprint(path: str) -> FileFingerprint:
+    """Return (mtime_ns, size) for a file, or None if it cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PromptCache:
+    """Keeps prompt files in memory and re-reads them only when they change on disk."""
+
+    def __init__(self):
+        self._prompts: Dict[str, Tuple[FileFingerprint, str]] = {}
+
+    async def read(self, path: str) -> str:
+        fingerprint = get_file_fingerprint(path)
+        cached = self._prompts.get(path)
+        if cached and fingerprint is not None and cached[0] == fingerprint:
+            return cached[1]
+        async with aiofiles.open(path, 'r', encoding='utf-8') as prompt_file:
+            content = await prompt_file.read()
+        self._prompts[path] = (fingerprint, content)
+        return content
+
+
+PROMPT_CACHE = PromptCache()
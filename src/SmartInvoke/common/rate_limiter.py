@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+DEFAULT_RETRY_AFTER = 1.0
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+_SECONDS_PER_MINUTE = 60.0
+
+
+def estimate_prompt_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+    """Cheap prompt size estimate used for rate limiting.
+
+    Azure OpenAI also counts characters rather than tokenizing when it applies
+    the TPM limit, so running a tokenizer here would not be more accurate.
+    """
+    total = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(str(part.get("text", "")) for part in content if isinstance(part, dict))
+        total += len(str(content)) // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE
+    return total
+
+
+class TokenBucket:
+    """Bucket refilled continuously up to ``capacity`` per minute."""
+
+    def __init__(self, capacity: int):
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self.refill_rate = capacity / _SECONDS_PER_MINUTE
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available; requests larger than the bucket wait for a full bucket."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.refill_rate) if self.refill_rate else 0.0
+
+    def consume(self, amount: float) -> None:
+        self.level -= amount
+
+    def limit_to(self, remaining: float) -> None:
+        self.level = min(self.level, remaining)
+
+
+class DeploymentRateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter for one deployment.
+
+    Callers queue on an asyncio lock, which wakes waiters in FIFO order, so a
+    burst of concurrent requests is spread over the quota instead of failing
+    together with 429s. The buckets are corrected from the
+    ``x-ratelimit-remaining-*`` response headers, and a ``retry-after`` pauses
+    every caller of the deployment.
+    """
+
+    def __init__(self, deployment: str, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.deployment = deployment
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _buckets(self):
+        return [bucket for bucket in (self.requests, self.tokens) if bucket is not None]
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until the deployment has room for one request of ``estimated_tokens``."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                for bucket in self._buckets():
+                    bucket.refill(now)
+                wait = self.paused_until - now
+                if self.requests:
+                    wait = max(wait, self.requests.wait_time(1))
+                if self.tokens:
+                    wait = max(wait, self.tokens.wait_time(estimated_tokens))
+                if wait <= 0:
+                    break
+                logging.info(f"Rate limiter waiting {wait:.2f}s for deployment {self.deployment}")
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(estimated_tokens)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        if not headers:
+            return
+        now = time.monotonic()
+        remaining_requests = _header_number(headers, "x-ratelimit-remaining-requests")
+        if self.requests and remaining_requests is not None:
+            self.requests.refill(now)
+            self.requests.limit_to(remaining_requests)
+        remaining_tokens = _header_number(headers, "x-ratelimit-remaining-tokens")
+        if self.tokens and remaining_tokens is not None:
+            self.tokens.refill(now)
+            self.tokens.limit_to(remaining_tokens)
+        retry_after = _header_number(headers, "retry-after-ms")
+        retry_after = retry_after / 1000 if retry_after is not None else _header_number(headers, "retry-after")
+        if retry_after:
+            self.pause(retry_after)
+
+    def throttled(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Record a 429; pause for ``retry-after`` or ``DEFAULT_RETRY_AFTER`` when it is missing."""
+        paused_until = self.paused_until
+        self.update_from_headers(headers)
+        if self.paused_until == paused_until:
+            self.pause(DEFAULT_RETRY_AFTER)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        logging.warning(f"Deployment {self.deployment} throttled, pausing requests for {seconds:.2f}s")
+
+
+def _header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiterRegistry:
+    """Process-wide limiters keyed by deployment name."""
+
+    _limiters: Dict[str, DeploymentRateLimiter] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, deployment: str, requests_per_minute: int, tokens_per_minute: int) -> Optional[DeploymentRateLimiter]:
+        """Return the limiter for ``deployment``, or None when no limit is configured."""
+        if requests_per_minute <= 0 and tokens_per_minute <= 0:
+            return None
+        limiter = cls._limiters.get(deployment)
+        if limiter is None:
+            with cls._lock:
+                limiter = cls._limiters.setdefault(
+                    deployment, DeploymentRateLimiter(deployment, requests_per_minute, tokens_per_minute)
+                )
+        return limiter
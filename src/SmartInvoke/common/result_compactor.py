@@ -0,0 +1,161 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from .functions import parse_responsejson
+from .tokenizer import count_text_tokens
+from .tracing import TRACER
+
+TRUNCATION_MARKER = " ...[truncated]"
+MIN_FIELD_MATCH_LENGTH = 3
+_KEY_SEPARATORS = re.compile(r"[^0-9a-z]")
+
+
+def _normalize(key: Any) -> str:
+    return _KEY_SEPARATORS.sub("", str(key).lower())
+
+
+def parse_result(result: Any) -> Any:
+    """Return the agent result as parsed JSON, or the result itself when it is not JSON."""
+    if not isinstance(result, str) or ('{' not in result and '[' not in result):
+        return result
+    try:
+        return json.loads(result)
+    except ValueError:
+        try:
+            parsed = parse_responsejson(result)
+        except Exception:
+            return result
+        return parsed if parsed is not None else result
+
+
+def minify(data: Any) -> str:
+    if isinstance(data, str):
+        return data
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def drop_empty(data: Any) -> Any:
+    """Remove null, empty string and empty container values."""
+    if isinstance(data, dict):
+        cleaned = {key: drop_empty(value) for key, value in data.items()}
+        return {key: value for key, value in cleaned.items() if value not in (None, "", [], {})}
+    if isinstance(data, list):
+        return [drop_empty(value) for value in data]
+    return data
+
+
+def keep_fields(data: Any, fields: List[str]) -> Any:
+    """Keep only the branches that lead to a key matching one of ``fields``.
+
+    Keys match when one normalized name contains the other, so ``email``
+    matches a ``ManagerEmail`` dependency. Scalar siblings of a kept branch are
+    kept too, as the value may sit under a key named differently, like ``ID``
+    next to ``Employee``. Returns None when nothing matches.
+    """
+    if isinstance(data, dict):
+        kept = {}
+        for key, value in data.items():
+            name = _normalize(key)
+            if len(name) >= MIN_FIELD_MATCH_LENGTH and any(name in field or field in name for field in fields):
+                kept[key] = value
+            elif isinstance(value, (dict, list)):
+                value = keep_fields(value, fields)
+                if value is not None:
+                    kept[key] = value
+        if not kept:
+            return None
+        return {key: kept.get(key, value) for key, value in data.items()
+                if key in kept or not isinstance(value, (dict, list))}
+    if isinstance(data, list):
+        kept = [value for value in (keep_fields(item, fields) for item in data) if value is not None]
+        return kept or None
+    return None
+
+
+def limit_lists(data: Any, max_items: int) -> Any:
+    """Cut every list to ``max_items`` entries, noting how many were left out."""
+    if isinstance(data, dict):
+        return {key: limit_lists(value, max_items) for key, value in data.items()}
+    if isinstance(data, list):
+        items = [limit_lists(value, max_items) for value in data[:max_items]]
+        if len(data) > max_items:
+            items.append(f"... {len(data) - max_items} more items omitted")
+        return items
+    return data
+
+
+def longest_list(data: Any) -> int:
+    if isinstance(data, dict):
+        return max((longest_list(value) for value in data.values()), default=0)
+    if isinstance(data, list):
+        return max([len(data)] + [longest_list(value) for value in data])
+    return 0
+
+
+class ResultCompactor:
+    """Shrinks agent results before they are sent to an LLM stage.
+
+    JSON results are minified and stripped of empty values. When that is still
+    over the token budget and the stage names the fields it needs, only the
+    branches leading to those fields are kept. Lists are then cut until the
+    result fits the budget, and whatever is still too long is truncated.
+    """
+
+    def __init__(self, enabled: bool = True, model: str = "gpt-3.5-turbo-0613"):
+        self.enabled = enabled
+        self.model = model
+
+    def count(self, text: str) -> int:
+        return count_text_tokens(text, self.model)
+
+    def compact(self, result: Any, token_budget: int, stage: str, fields: Optional[Iterable[str]] = None) -> str:
+        """Compact a single agent result; ``fields`` are the keys the stage needs from it."""
+        original = result if isinstance(result, str) else json.dumps(result, indent=2, default=str)
+        if not self.enabled or token_budget <= 0:
+            return original
+        return self.compact_data(original, parse_result(result), token_budget, stage, fields)
+
+    def compact_results(self, results: Dict[str, Any], token_budget: int, stage: str) -> str:
+        """Compact the results of several steps, keyed by step, into one JSON document."""
+        original = json.dumps(results, indent=2, default=str)
+        if not self.enabled or token_budget <= 0:
+            return original
+        parsed = {step: parse_result(result) for step, result in results.items()}
+        return self.compact_data(original, parsed, token_budget, stage)
+
+    def compact_data(self, original: str, data: Any, token_budget: int, stage: str, fields: Optional[Iterable[str]] = None) -> str:
+        original_tokens = self.count(original)
+        if not isinstance(data, str):
+            data = drop_empty(data)
+            wanted = [_normalize(field) for field in fields or () if len(_normalize(field)) >= MIN_FIELD_MATCH_LENGTH]
+            if wanted and self.count(minify(data)) > token_budget:
+                data = keep_fields(data, wanted) or data
+            data = self.fit_lists(data, token_budget)
+        compacted = self.truncate(minify(data), token_budget)
+        compacted_tokens = self.count(compacted)
+        if compacted_tokens >= original_tokens:
+            return original
+        logging.info(f"Compacted {stage} input from {original_tokens} to {compacted_tokens} tokens, "
+                     f"saving {original_tokens - compacted_tokens}")
+        TRACER.set_attribute(f"compaction.{stage}.saved_tokens", original_tokens - compacted_tokens)
+        return compacted
+
+    def fit_lists(self, data: Any, token_budget: int) -> Any:
+        """Halve the list length limit until the result fits the budget or every list has one item."""
+        max_items = longest_list(data)
+        compacted = data
+        while max_items > 1 and self.count(minify(compacted)) > token_budget:
+            max_items //= 2
+            compacted = limit_lists(data, max_items)
+        return compacted
+
+    def truncate(self, text: str, token_budget: int) -> str:
+        if self.count(text) <= token_budget:
+            return text
+        # Characters per token varies by content, so shrink by the measured ratio until the text fits.
+        while text and self.count(text + TRUNCATION_MARKER) > token_budget:
+            ratio = token_budget / self.count(text + TRUNCATION_MARKER)
+            text = text[:int(len(text) * min(ratio, 0.95))]
+        return text + TRUNCATION_MARKER
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller starts the call as a task; callers arriving while it runs
+    await the same task. Each caller waits through ``asyncio.shield``, so a
+    cancelled caller never cancels the call the others are waiting on.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Return the running task for ``key``, starting ``factory()`` if there is none."""
+        task = self._calls.get(key)
+        if task is not None:
+            logging.info(f"Sharing in-flight {self.name} call")
+            return task
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, factory))
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so a call whose callers were all cancelled does not warn on garbage collection.
+            logging.debug(f"In-flight {self.name} call failed: {task.exception()}")
+
+    def __len__(self) -> int:
+        return len(self._calls)
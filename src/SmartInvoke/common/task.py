@@ -9,6 +9,7 @@ class Task:
     status_message: str = ""
     dependencies: List[Tuple[str, int]] = field(default_factory=list)
     result: Optional[Any] = None
+    dependency_paths: Dict[str, str] = field(default_factory=dict)
 
     def get_agent_name(self) -> str:
         return self.agent_name
@@ -0,0 +1,80 @@
+import functools
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Tuple
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-3.5-turbo-0613"
+DEFAULT_ENCODING = "cl100k_base"
+APPROXIMATE_CHARS_PER_TOKEN = 4
+# Below this many characters encoding the texts one by one beats the thread pool encode_batch starts.
+BATCH_MIN_CHARS = 16384
+# Every reply is primed with <|start|>assistant<|message|>.
+REPLY_PRIMING_TOKENS = 3
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_MODEL) -> tiktoken.Encoding:
+    """Return the encoding for ``model``, loaded once per process."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logging.info(f"Warning: model {model} not found. Using {DEFAULT_ENCODING} encoding.")
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_text_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def count_text_tokens_batch(texts: List[str], model: str = DEFAULT_MODEL) -> List[int]:
+    """Count the tokens of several texts, encoding them in parallel when they are large enough to pay off."""
+    encoding = get_encoding(model)
+    if len(texts) > 1 and sum(len(text) for text in texts) >= BATCH_MIN_CHARS:
+        return [len(tokens) for tokens in encoding.encode_batch(texts)]
+    return [len(encoding.encode(text)) for text in texts]
+
+
+def message_overhead(model: str) -> Tuple[int, int]:
+    """Tokens added per message and per ``name`` field by the chat format."""
+    if model == "gpt-3.5-turbo-0301":
+        # every message follows <|start|>{role/name}\n{content}<|end|>\n and a name replaces the role
+        return 4, -1
+    return 3, 1
+
+
+def count_message_tokens(messages: Iterable[Dict[str, Any]], model: str = DEFAULT_MODEL) -> int:
+    """Return the number of prompt tokens used by a list of chat messages."""
+    messages = list(messages)
+    tokens_per_message, tokens_per_name = message_overhead(model)
+    texts = [str(value) for message in messages for value in message.values()]
+    names = sum(1 for message in messages if "name" in message)
+    return (sum(count_text_tokens_batch(texts, model)) + tokens_per_message * len(messages)
+            + tokens_per_name * names + REPLY_PRIMING_TOKENS)
+
+
+def approximate_tokens(text: str) -> int:
+    """Character based estimate, for size checks that do not need an exact count."""
+    return math.ceil(len(text) / APPROXIMATE_CHARS_PER_TOKEN)
+
+
+def approximate_message_tokens(messages: Iterable[Dict[str, Any]]) -> int:
+    tokens_per_message, _ = message_overhead(DEFAULT_MODEL)
+    return sum(approximate_tokens(str(message.get("content", ""))) + tokens_per_message for message in messages) + REPLY_PRIMING_TOKENS
+
+
+def split_text_by_token(text: str, max_tokens: int, chunk_overlap: int, model: str = "gpt-4-0314") -> List[str]:
+    """Split a text into chunks of a maximum number of tokens with a specified overlap."""
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be greater than 0")
+    if chunk_overlap < 0:
+        raise ValueError("chunk_overlap must be non-negative")
+    if chunk_overlap >= max_tokens:
+        raise ValueError("chunk_overlap must be less than max_tokens")
+
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    step = max_tokens - chunk_overlap
+    chunks = [tokens[start:start + max_tokens] for start in range(0, len(tokens), step)]
+    return [encoding.decode(chunk) for chunk in chunks]
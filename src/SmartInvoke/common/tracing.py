@@ -0,0 +1,221 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from tabulate import tabulate
+
+from .log_pipeline import log_event
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation in a request trace."""
+
+    def __init__(self, trace: Optional['RequestTrace'], name: str, parent: Optional['Span'], kind: int,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.parent = parent
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self.status_code = STATUS_OK
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{error.__class__.__name__}: {error}"
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    @property
+    def depth(self) -> int:
+        return 0 if self.parent is None else self.parent.depth + 1
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time or self.start_time),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status_code, "message": self.status_message}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class RequestTrace:
+    """The spans recorded for one request; exported when its root span ends."""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.closed = False
+
+    def to_otlp(self, service_name: str) -> Dict[str, Any]:
+        """Render the trace in the OTLP/JSON ``ExportTraceServiceRequest`` shape."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "smartinvoke"}, "spans": [span.to_otlp() for span in self.spans]}]
+            }]
+        }
+
+    def summary(self) -> str:
+        """Span durations on one line, e.g. ``invoke=2.104 planning=1.380 task[error]=0.512``."""
+        return " ".join(f"{span.name}{'[error]' if span.status_code == STATUS_ERROR else ''}={span.duration:.3f}"
+                        for span in sorted(self.spans, key=lambda span: span.start_time))
+
+    def report(self) -> str:
+        rows = [["  " * span.depth + span.name, f"{span.duration:.3f}", "error" if span.status_code == STATUS_ERROR else ""]
+                for span in sorted(self.spans, key=lambda span: span.start_time)]
+        return tabulate(rows, headers=["Span", "Duration (Sec)", "Status"], tablefmt="grid")
+
+
+class SpanExporter:
+    """Receives every finished request trace in OTLP/JSON form."""
+
+    def export(self, trace_data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+
+class LoggingSpanExporter(SpanExporter):
+    def export(self, trace_data: Dict[str, Any]) -> None:
+        logging.info(json.dumps(trace_data))
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends one OTLP/JSON document per trace to a file; meant for local runs and tests."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, trace_data: Dict[str, Any]) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as trace_file:
+            trace_file.write(json.dumps(trace_data) + "\n")
+
+
+def create_span_exporter(exporter: Optional[str], file_path: Optional[str] = None) -> Optional[SpanExporter]:
+    """Map the TRACING_EXPORTER setting ("log", "file" or empty) to an exporter."""
+    exporter = (exporter or "").lower()
+    if exporter == "log":
+        return LoggingSpanExporter()
+    if exporter == "file":
+        return FileSpanExporter(file_path or "traces.jsonl")
+    return None
+
+
+class Tracer:
+    """Request-scoped span tracing.
+
+    The active trace and span live in context variables, so spans opened in
+    tasks started by the plan scheduler nest under the span that started them.
+    Spans opened outside ``start_trace`` are not recorded.
+    """
+
+    def __init__(self, service_name: str = "Smart-Invoker", exporter: Optional[SpanExporter] = None):
+        self.service_name = service_name
+        self.exporter = exporter
+        self._trace: ContextVar[Optional[RequestTrace]] = ContextVar("trace", default=None)
+        self._span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+        self.span_listeners: List[Callable[[Span], None]] = []
+
+    def add_span_listener(self, listener: Callable[[Span], None]) -> None:
+        """Call ``listener`` with every span that ends inside a trace."""
+        if listener not in self.span_listeners:
+            self.span_listeners.append(listener)
+
+    @property
+    def current_span(self) -> Optional[Span]:
+        return self._span.get()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the current span, if there is one."""
+        span = self._span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @contextmanager
+    def start_trace(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        trace = RequestTrace()
+        trace_token = self._trace.set(trace)
+        span_token = self._span.set(None)
+        try:
+            with self.start_span(name, attributes, kind=SPAN_KIND_SERVER) as span:
+                yield span
+        finally:
+            trace.closed = True
+            self._span.reset(span_token)
+            self._trace.reset(trace_token)
+            self.finish_trace(trace)
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = SPAN_KIND_INTERNAL) -> Iterator[Span]:
+        trace = self._trace.get()
+        if trace is not None and trace.closed:
+            trace = None
+        span = Span(trace, name, self._span.get() if trace else None, kind, attributes)
+        token = self._span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            span.end_time = time.time_ns()
+            self._span.reset(token)
+            if trace is not None:
+                trace.spans.append(span)
+                for listener in self.span_listeners:
+                    listener(span)
+
+    def finish_trace(self, trace: RequestTrace) -> None:
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("\n\n" + trace.report() + "\n\n")
+        log_event("trace", "Request trace", trace_id=trace.trace_id, spans=trace.summary())
+        if self.exporter is None:
+            return
+        try:
+            self.exporter.export(trace.to_otlp(self.service_name))
+        except Exception as e:
+            logging.error(f"Error exporting trace {trace.trace_id}: {e}")
+
+
+TRACER = Tracer()
@@ -0,0 +1,40 @@
+"""Tests for common.command_matcher.
+
+Run from src/SmartInvoke::
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if APP_ROOT not in sys.path:
+    sys.path.insert(0, APP_ROOT)
+
+from common.command_matcher import CommandMatcher, command_phrases
+from common.commandidentification import Commands
+
+
+class CommandMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = CommandMatcher(command_phrases(Commands))
+
+    def test_escalates_typo_in_context_suffix(self):
+        for request in ("set context it", "set context pr", "set context ir", "set context sale"):
+            with self.subTest(request=request):
+                self.assertIsNone(self.matcher.match(request))
+
+    def test_matches_typo_outside_distinguishing_suffix(self):
+        self.assertEqual(self.matcher.match("set contxt hr"), "set context hr")
+        self.assertEqual(self.matcher.match("Set Context: HR"), "set context hr")
+
+    def test_matches_unambiguous_typo_in_long_suffix(self):
+        self.assertEqual(self.matcher.match("set context financ"), "set context finance")
+        self.assertEqual(self.matcher.match("new sesion"), "new session")
+        self.assertEqual(self.matcher.match("feedbackpositiv"), "feedbackpositive")
+
+
+if __name__ == "__main__":
+    unittest.main()
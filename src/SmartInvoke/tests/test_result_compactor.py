@@ -0,0 +1,49 @@
+"""Tests for common.result_compactor.
+
+Run from src/SmartInvoke::
+
+    python -m unittest discover -s tests
+"""
+import json
+import os
+import sys
+import unittest
+
+APP_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if APP_ROOT not in sys.path:
+    sys.path.insert(0, APP_ROOT)
+
+from common.result_compactor import ResultCompactor, keep_fields
+
+
+class KeepFieldsTest(unittest.TestCase):
+
+    def test_keeps_scalar_sibling_of_matched_branch(self):
+        data = {"Employee": {"Name": "Alice"}, "ID": "E123"}
+        self.assertEqual(keep_fields(data, ["employeeid"]), data)
+
+    def test_keeps_differently_named_scalar_next_to_matched_list(self):
+        data = {"EmpNo": "E123", "LeaveTypes": ["Casual", "Sick"], "History": [{"Note": "late"}]}
+        self.assertEqual(keep_fields(data, ["employeeid", "leavetype"]),
+                         {"EmpNo": "E123", "LeaveTypes": ["Casual", "Sick"]})
+
+
+class ResultCompactorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.compactor = ResultCompactor()
+
+    def test_does_not_prune_fields_under_budget(self):
+        result = json.dumps({"Employee": {"Name": "Alice"}, "ID": "E123", "Team": {"Name": "HR"}}, indent=2)
+        compacted = json.loads(self.compactor.compact(result, 2000, "dependency_resolution", ["EmployeeId"]))
+        self.assertEqual(compacted, {"Employee": {"Name": "Alice"}, "ID": "E123", "Team": {"Name": "HR"}})
+
+    def test_over_budget_pruning_keeps_differently_named_value(self):
+        history = [{"Date": f"2025-01-{day:02d}", "Note": "Approved by the manager"} for day in range(1, 29)]
+        result = json.dumps({"EmpNo": "E123", "LeaveTypes": ["Casual", "Sick"], "History": history}, indent=2)
+        compacted = json.loads(self.compactor.compact(result, 100, "dependency_resolution", ["EmployeeId", "LeaveType"]))
+        self.assertEqual(compacted, {"EmpNo": "E123", "LeaveTypes": ["Casual", "Sick"]})
+
+
+if __name__ == "__main__":
+    unittest.main()